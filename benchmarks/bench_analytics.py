@@ -0,0 +1,75 @@
+"""Benchmark: cost of one analytics update as the stored history grows.
+
+A refresh normally changes only the latest month or two; the time per
+update should stay flat while the history gets longer. Needs a Home
+Assistant development environment. Run from the repository root:
+
+    python benchmarks/bench_analytics.py --sizes 120 1200 12000
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import pathlib
+import sys
+import timeit
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from custom_components.guotou_water.analytics import ConsumptionAnalytics  # noqa: E402
+from custom_components.guotou_water.parser import BillAggregate  # noqa: E402
+from synthetic import make_rows  # noqa: E402
+
+
+def bench_size(size: int, number: int) -> dict:
+    """Time update() + evaluate() with the latest month changing every call."""
+    now = datetime.datetime.now()
+    aggregate = BillAggregate()
+    aggregate.update({row["month"]: row for row in make_rows(size, seed=3)})
+    summary = aggregate.summary(now.year, now.month)
+    # A list, so the latest month can be swapped below
+    history = list(summary.history)
+    data = {
+        "yearly_volume": summary.yearly_volume,
+        "yearly_amount": summary.yearly_amount,
+        "unit_price": 3.45,
+    }
+
+    analytics = ConsumptionAnalytics()
+    cold = timeit.timeit(lambda: ConsumptionAnalytics().update(history), number=1)
+    analytics.update(history)
+
+    latest = history[-1]
+    volumes = [latest["volume"], latest["volume"] + 1.0]
+    state = {"index": 0}
+    changed = {latest["date"]}
+
+    def _refresh() -> None:
+        state["index"] ^= 1
+        history[-1] = {**latest, "volume": volumes[state["index"]]}
+        analytics.update(history, changed)
+        analytics.evaluate(data, now)
+
+    per_call = min(timeit.repeat(_refresh, number=number, repeat=5)) / number
+    return {
+        "benchmark": "analytics_refresh",
+        "history_months": len(history),
+        "cold_build_ms": round(cold * 1000, 3),
+        "refresh_us": round(per_call * 1e6, 2),
+    }
+
+
+def main() -> None:
+    """Parse arguments and print JSON results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[120, 1200, 12000])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+    results = [bench_size(size, args.number) for size in args.sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""End-to-end benchmark of SQZLSWaterDataUpdateCoordinator against the fake server.
+
+Measures refresh latency (cold and incremental), bill parse throughput, peak
+memory of a refresh and event-loop lag while many coordinators refresh at
+once. Needs a Home Assistant development environment. Run from the
+repository root:
+
+    python benchmarks/bench_coordinator.py --houses 200 --output bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import aiohttp
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.guotou_water import SQZLSWaterDataUpdateCoordinator  # noqa: E402
+from custom_components.guotou_water.api import SQZLSWaterApiClient  # noqa: E402
+from custom_components.guotou_water.parser import BillAggregate  # noqa: E402
+from custom_components.guotou_water.store import SQZLSWaterStore  # noqa: E402
+from fake_server import FakeServer, FakeServerConfig  # noqa: E402
+from synthetic import make_rows  # noqa: E402
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    """Summarize samples in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _coordinator(
+    hass: HomeAssistant, client: SQZLSWaterApiClient, house_id: str
+) -> SQZLSWaterDataUpdateCoordinator:
+    """Create a coordinator with an empty in-memory store."""
+    return SQZLSWaterDataUpdateCoordinator(
+        hass, house_id, 7200, client, SQZLSWaterStore(hass, house_id)
+    )
+
+
+def _seed_store(coordinator: SQZLSWaterDataUpdateCoordinator, rows: int) -> None:
+    """Fill the store as if `rows` months had been synced before."""
+    coordinator.store.async_merge_bills(make_rows(rows, seed=1))
+
+
+async def bench_latency(hass, client, iterations: int, rows: int) -> list[dict]:
+    """Refresh latency of one house, cold (empty store) and incremental."""
+    results = []
+    cold, warm = [], []
+    for index in range(iterations):
+        coordinator = _coordinator(hass, client, f"latency-{index}")
+        start = time.perf_counter()
+        await coordinator.async_refresh()
+        cold.append(time.perf_counter() - start)
+
+        _seed_store(coordinator, rows)
+        start = time.perf_counter()
+        await coordinator.async_refresh()
+        warm.append(time.perf_counter() - start)
+    results.append({"benchmark": "refresh_cold", "iterations": iterations, **_percentiles(cold)})
+    results.append(
+        {
+            "benchmark": "refresh_incremental",
+            "iterations": iterations,
+            "stored_rows": rows,
+            **_percentiles(warm),
+        }
+    )
+    return results
+
+
+def bench_parse(rows: int, repeat: int) -> dict:
+    """Throughput of aggregating every stored row into the bill summary."""
+    bill_rows = {row["month"]: row for row in make_rows(rows, seed=2)}
+    now = datetime.datetime.now()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        aggregate = BillAggregate()
+        aggregate.update(bill_rows)
+        aggregate.summary(now.year, now.month)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "benchmark": "parse_throughput",
+        "rows": rows,
+        "best_ms": round(best * 1000, 3),
+        "rows_per_second": round(rows / best),
+    }
+
+
+async def bench_memory(hass, client, rows: int) -> dict:
+    """Peak traced memory of one incremental refresh with a large history."""
+    coordinator = _coordinator(hass, client, "memory")
+    await coordinator.async_refresh()
+    _seed_store(coordinator, rows)
+    tracemalloc.start()
+    await coordinator.async_refresh()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"benchmark": "refresh_peak_memory", "stored_rows": rows, "peak_kib": round(peak / 1024, 1)}
+
+
+async def bench_fleet(hass, client, houses: int, rows: int) -> dict:
+    """Event-loop lag while `houses` coordinators refresh concurrently."""
+    coordinators = [_coordinator(hass, client, f"fleet-{index}") for index in range(houses)]
+    for coordinator in coordinators:
+        _seed_store(coordinator, rows)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    interval = 0.005
+
+    async def _monitor() -> None:
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, loop.time() - expected))
+
+    monitor = asyncio.create_task(_monitor())
+    start = time.perf_counter()
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    failed = sum(not coordinator.last_update_success for coordinator in coordinators)
+    return {
+        "benchmark": "fleet_refresh",
+        "houses": houses,
+        "stored_rows": rows,
+        "wall_ms": round(elapsed * 1000, 3),
+        "failed": failed,
+        "loop_lag": _percentiles(lags or [0.0]),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    """Run every benchmark and return the results."""
+    config = FakeServerConfig(
+        latency=args.latency,
+        latency_jitter=args.latency / 2,
+        error_rate=args.error_rate,
+        rows=args.rows,
+    )
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        async with FakeServer(config) as server, aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100)
+        ) as session:
+            # No freshness window, so every refresh really goes to the server
+            client = SQZLSWaterApiClient(
+                session,
+                bills_url=server.bills_url,
+                house_url=server.house_url,
+                cache_ttl=0,
+            )
+            results += await bench_latency(hass, client, args.iterations, args.history)
+            results.append(bench_parse(args.history, args.iterations))
+            results.append(await bench_memory(hass, client, args.history))
+            results.append(await bench_fleet(hass, client, args.houses, args.history))
+            requests = dict(server.config.requests)
+        await hass.async_stop(force=True)
+
+    meta = {
+        "python": sys.version.split()[0],
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "params": {**vars(args), "output": None},
+        "server_requests": requests,
+    }
+    return [{**result, "meta": meta} for result in results]
+
+
+def main() -> None:
+    """Parse arguments, run the suite and emit JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--houses", type=int, default=200, help="concurrent coordinators")
+    parser.add_argument("--rows", type=int, default=36, help="rows served per house")
+    parser.add_argument("--history", type=int, default=1200, help="months already stored")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="server latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=pathlib.Path, help="write JSON results here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
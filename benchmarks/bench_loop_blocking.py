@@ -0,0 +1,262 @@
+"""Event-loop blocking time of one refresh with a large listByMonth response.
+
+The store of the measured house has an unpaid month years back, so the sync
+window covers the whole history and every poll downloads --rows rows. After
+one warm-up refresh, the server pads the rows differently on every poll, so
+each response has to be decoded, merged and aggregated again although no
+bill changed (the steady state of a large house). Three decoding pipelines
+are compared:
+
+- stdlib_inline: json.loads and row aggregation on the event loop
+- orjson_inline: orjson (homeassistant.util.json) on the event loop
+- orjson_executor: orjson, with large bodies and histories in the executor
+
+For each, the time the loop spent running callbacks during the refresh
+(busy), the longest single callback and the lag of a 1 ms heartbeat are
+reported. The fake server runs on its own loop in another thread, so its
+JSON encoding is not counted. Needs a Home Assistant development environment.
+Run from the repository root:
+
+    python benchmarks/bench_loop_blocking.py --rows 1200 --padding 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import pathlib
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import aiohttp
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.util.json import json_loads  # noqa: E402
+
+import custom_components.guotou_water as integration  # noqa: E402
+from custom_components.guotou_water import api  # noqa: E402
+from custom_components.guotou_water.metrics import create_trace_config  # noqa: E402
+from custom_components.guotou_water.store import SQZLSWaterStore  # noqa: E402
+from fake_server import FakeServer, FakeServerConfig  # noqa: E402
+from synthetic import make_rows  # noqa: E402
+
+MODES = {
+    # mode: (decoder, executor byte threshold, executor row threshold)
+    "stdlib_inline": (json.loads, float("inf"), float("inf")),
+    "orjson_inline": (json_loads, float("inf"), float("inf")),
+    "orjson_executor": (
+        json_loads,
+        api.JSON_EXECUTOR_MIN_BYTES,
+        integration.PARSE_EXECUTOR_MIN_ROWS,
+    ),
+}
+
+
+class LoopProfiler:
+    """Time every callback the event loop runs while active."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.active = False
+        self.busy = 0.0
+        self.longest = 0.0
+        self._thread = threading.get_ident()
+        self._original = asyncio.events.Handle._run  # noqa: SLF001
+
+    def install(self) -> None:
+        """Wrap asyncio.Handle._run."""
+        original, profiler = self._original, self
+
+        def _run(handle: asyncio.Handle) -> None:
+            start = time.perf_counter()
+            try:
+                original(handle)
+            finally:
+                if profiler.active and threading.get_ident() == profiler._thread:
+                    elapsed = time.perf_counter() - start
+                    profiler.busy += elapsed
+                    profiler.longest = max(profiler.longest, elapsed)
+
+        asyncio.events.Handle._run = _run  # noqa: SLF001
+
+    def uninstall(self) -> None:
+        """Restore asyncio.Handle._run."""
+        asyncio.events.Handle._run = self._original  # noqa: SLF001
+
+    def reset(self) -> None:
+        """Start a new measurement of the calling thread's loop."""
+        self.busy = self.longest = 0.0
+        self._thread = threading.get_ident()
+
+
+class ThreadedServer:
+    """Run FakeServer on an event loop of its own."""
+
+    def __init__(self, config: FakeServerConfig) -> None:
+        """Initialize the thread."""
+        self.server = FakeServer(config)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self) -> FakeServer:
+        """Start the loop and the server."""
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(
+            self.server.__aenter__(), self._loop
+        ).result()
+        return self.server
+
+    def __exit__(self, *exc) -> None:
+        """Stop the server and the loop."""
+        asyncio.run_coroutine_threadsafe(
+            self.server.__aexit__(), self._loop
+        ).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def _seed_store(store: SQZLSWaterStore, house_id: str, rows: int) -> None:
+    """Store what the fake server serves, with the oldest month unpaid."""
+    served = make_rows(rows, seed=zlib.crc32(house_id.encode()))
+    served[0] = {**served[0], "isPaid": False}
+    store.async_merge_bills(served)
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    """Summarize samples in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def bench_mode(
+    hass: HomeAssistant,
+    server: FakeServer,
+    session: aiohttp.ClientSession,
+    profiler: LoopProfiler,
+    mode: str,
+    args: argparse.Namespace,
+) -> dict:
+    """Measure --iterations refreshes with one decoding pipeline."""
+    decoder, min_bytes, min_rows = MODES[mode]
+    api.json_loads = decoder
+    api.JSON_EXECUTOR_MIN_BYTES = min_bytes
+    integration.PARSE_EXECUTOR_MIN_ROWS = min_rows
+    client = api.SQZLSWaterApiClient(
+        session, bills_url=server.bills_url, house_url=server.house_url, cache_ttl=0
+    )
+
+    house_id = f"{mode}-house"
+    store = SQZLSWaterStore(hass, house_id)
+    _seed_store(store, house_id, args.rows)
+    coordinator = integration.SQZLSWaterDataUpdateCoordinator(
+        hass, house_id, 7200, client, store
+    )
+    await coordinator.async_refresh()
+
+    busy, longest, lags, wall, sizes = [], [], [], [], []
+    for index in range(args.iterations):
+        # A different body every poll, with the same bill fields
+        server.config.padding = args.padding + index + 1
+
+        stop = asyncio.Event()
+
+        async def _heartbeat() -> None:
+            loop = asyncio.get_running_loop()
+            while not stop.is_set():
+                expected = loop.time() + 0.001
+                await asyncio.sleep(0.001)
+                lags.append(max(0.0, loop.time() - expected))
+
+        heartbeat = asyncio.create_task(_heartbeat())
+        await asyncio.sleep(0)
+        profiler.reset()
+        profiler.active = True
+        start = time.perf_counter()
+        await coordinator.async_refresh()
+        wall.append(time.perf_counter() - start)
+        profiler.active = False
+        stop.set()
+        await heartbeat
+
+        if not coordinator.last_update_success:
+            raise RuntimeError(f"Refresh failed in mode {mode}")
+        busy.append(profiler.busy)
+        longest.append(profiler.longest)
+        sizes.append(coordinator.metrics.bills.response_bytes.last)
+
+    return {
+        "benchmark": "loop_blocking",
+        "mode": mode,
+        "rows": args.rows,
+        "response_bytes": int(statistics.median(sizes)),
+        "busy": _summary(busy),
+        "longest_callback": _summary(longest),
+        "heartbeat_lag": _summary(lags or [0.0]),
+        "wall": _summary(wall),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    """Run every mode and return the results."""
+    config = FakeServerConfig(rows=args.rows)
+    profiler = LoopProfiler()
+    profiler.install()
+    results: list[dict] = []
+    try:
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = HomeAssistant(config_dir)
+            with ThreadedServer(config) as server:
+                async with aiohttp.ClientSession(
+                    trace_configs=[create_trace_config()]
+                ) as session:
+                    for mode in args.modes:
+                        results.append(
+                            await bench_mode(
+                                hass, server, session, profiler, mode, args
+                            )
+                        )
+            await hass.async_stop(force=True)
+    finally:
+        profiler.uninstall()
+
+    meta = {
+        "python": sys.version.split()[0],
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "params": {**vars(args), "output": None},
+    }
+    return [{**result, "meta": meta} for result in results]
+
+
+def main() -> None:
+    """Parse arguments, run the suite and emit JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1200, help="rows served per house")
+    parser.add_argument("--padding", type=int, default=0, help="extra bytes per row")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument(
+        "--modes", nargs="+", choices=list(MODES), default=list(MODES)
+    )
+    parser.add_argument("--output", type=pathlib.Path, help="write JSON results here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
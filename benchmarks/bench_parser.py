@@ -0,0 +1,160 @@
+"""Micro-benchmark: incremental bill aggregation vs. the previous multi-pass code.
+
+Run from the repository root:
+
+    python benchmarks/bench_parser.py --rows 10000
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import pathlib
+import timeit
+
+from synthetic import make_rows
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def _load_parser():
+    """Import parser.py directly so Home Assistant is not required."""
+    path = ROOT / "custom_components" / "guotou_water" / "parser.py"
+    spec = importlib.util.spec_from_file_location("guotou_water_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_parse(rows: list[dict], current_year: int, current_month: int) -> dict:
+    """The multi-pass implementation previously inlined in the coordinator."""
+    result = {}
+    rows_sorted = sorted(rows, key=lambda x: x.get("month", ""), reverse=True)
+    latest = rows_sorted[0]
+    result["current_reading"] = float(latest.get("meterIndex", 0) or 0)
+    result["unit_price"] = float(latest.get("unitPrice", 0) or 0)
+    yearly_vol = yearly_amt = unpaid_total = 0.0
+    monthly_history = []
+    for row in rows:
+        month_str = row.get("month", "")
+        quantity = float(row.get("quantity", 0) or 0)
+        amount = float(row.get("amount", 0) or 0)
+        payable = float(row.get("payableAmount", 0) or 0)
+        paid = float(row.get("paidAmount", 0) or 0)
+        is_paid = row.get("isPaid", True)
+        if month_str.startswith(str(current_year)):
+            yearly_vol += quantity
+            yearly_amt += amount
+        if not is_paid:
+            unpaid_total += payable - paid
+        if month_str and quantity > 0:
+            monthly_history.append({
+                "date": month_str,
+                "volume": round(quantity, 2),
+                "amount": round(amount, 2),
+                "reading": float(row.get("meterIndex", 0) or 0),
+                "last_reading": float(row.get("lastMeterIndex", 0) or 0),
+                "unit_price": float(row.get("unitPrice", 0) or 0),
+                "is_paid": is_paid,
+            })
+    result["yearly_volume"] = round(yearly_vol, 2)
+    result["yearly_amount"] = round(yearly_amt, 2)
+    result["unpaid_amount"] = round(unpaid_total, 2)
+    current_month_str = f"{current_year}-{current_month:02d}-01"
+    for row in rows:
+        if row.get("month", "") == current_month_str:
+            result["monthly_volume"] = round(float(row.get("quantity", 0) or 0), 2)
+            break
+    monthly_history.sort(key=lambda x: x["date"])
+    result["monthly_history"] = monthly_history
+    return result
+
+
+def aggregate_summary(parser, aggregate, rows: dict, year: int, month: int) -> dict:
+    """Re-aggregate the given months and project the summary on the legacy keys."""
+    aggregate.update(rows)
+    summary = aggregate.summary(year, month)
+    return {
+        "current_reading": summary.latest.reading,
+        "unit_price": summary.latest.unit_price,
+        "yearly_volume": summary.yearly_volume,
+        "yearly_amount": summary.yearly_amount,
+        "unpaid_amount": summary.unpaid_amount,
+        "monthly_volume": summary.monthly_volume,
+        "monthly_history": list(summary.history),
+    }
+
+
+def _best(func, count: int, repeat: int) -> float:
+    """Return the best time of one call."""
+    number = max(1, 20000 // count)
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def run(row_counts: list[int], repeat: int) -> list[dict]:
+    """Benchmark the legacy parse against BillAggregate for every row count.
+
+    full: a cold build from every stored row (first refresh, restore).
+    refresh: a poll that re-fetched the latest two months, with the current
+    month's usage changed each time so the history is rebuilt; the legacy
+    code parsed every stored row again, the aggregate only those two.
+    """
+    parser = _load_parser()
+    results = []
+    for count in row_counts:
+        rows = make_rows(count)
+        by_month = {row["month"]: row for row in rows}
+        fetched = {row["month"]: row for row in rows[-2:]}
+        current = rows[-1]
+        polls = [
+            {**fetched, current["month"]: {**current, "quantity": quantity}}
+            for quantity in (float(current["quantity"]) + 1, current["quantity"])
+        ]
+        state = {"index": 0}
+
+        def _refresh() -> dict:
+            state["index"] ^= 1
+            return aggregate_summary(parser, warm, polls[state["index"]], year, month)
+        year, month = int(rows[-1]["month"][:4]), int(rows[-1]["month"][5:7])
+
+        legacy = legacy_parse(rows, year, month)
+        warm = parser.BillAggregate()
+        new = aggregate_summary(parser, warm, by_month, year, month)
+        assert new == aggregate_summary(parser, warm, fetched, year, month)
+        for key, value in new.items():
+            assert legacy.get(key, value) == value, key
+
+        legacy_ms = _best(lambda: legacy_parse(rows, year, month), count, repeat)
+        full_ms = _best(
+            lambda: aggregate_summary(
+                parser, parser.BillAggregate(), by_month, year, month
+            ),
+            count,
+            repeat,
+        )
+        refresh_ms = _best(_refresh, count, repeat)
+        results.append(
+            {
+                "benchmark": "bill_aggregate",
+                "rows": count,
+                "legacy_ms": round(legacy_ms * 1000, 3),
+                "full_ms": round(full_ms * 1000, 3),
+                "refresh_ms": round(refresh_ms * 1000, 3),
+                "full_speedup": round(legacy_ms / full_ms, 2),
+                "refresh_speedup": round(legacy_ms / refresh_ms, 2),
+            }
+        )
+    return results
+
+
+def main() -> None:
+    """Parse arguments and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[24, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
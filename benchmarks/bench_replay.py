@@ -0,0 +1,227 @@
+"""Replay a traffic capture through the coordinator and its sensors, offline.
+
+Captures are written by the guotou_water.stop_capture service. Every house in
+the capture gets a coordinator whose client answers from the capture, and the
+per-house sensors are driven the way their coordinator listeners drive them
+in Home Assistant (state key comparison, attributes of written states).
+Without --capture a synthetic capture is generated first.
+
+- replay_cold: first refresh of every house (decode, merge, parse, analytics,
+  view model, sensors)
+- replay_steady: further refreshes returning the same bodies (digest check
+  and unchanged-data short cut)
+
+Needs a Home Assistant development environment. Run from the repository root:
+
+    python benchmarks/bench_replay.py --capture guotou_water_captures/x.jsonl.gz
+    python benchmarks/bench_replay.py --houses 50 --rows 120 --save capture.jsonl.gz
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.guotou_water import SQZLSWaterDataUpdateCoordinator  # noqa: E402
+from custom_components.guotou_water.api import SQZLSWaterApiClient  # noqa: E402
+from custom_components.guotou_water.capture import (  # noqa: E402
+    ReplaySession,
+    TrafficCapture,
+    load_capture,
+)
+from custom_components.guotou_water.const import (  # noqa: E402
+    API_BASE_URL,
+    API_HOUSE_URL,
+    SENSOR_TYPES,
+    TARIFF_SENSOR_TYPES,
+)
+from custom_components.guotou_water.sensor import (  # noqa: E402
+    SQZLSWaterEstimateSensor,
+    SQZLSWaterHistorySensor,
+    SQZLSWaterSensor,
+)
+from custom_components.guotou_water.store import (  # noqa: E402
+    SQZLSWaterStore,
+    initial_sync_window,
+)
+from synthetic import make_house, make_rows  # noqa: E402
+
+
+def synthetic_capture(houses: int, rows: int) -> TrafficCapture:
+    """Record synthetic responses the way the client records real ones."""
+    capture = TrafficCapture()
+    begin, end = initial_sync_window(datetime.datetime.now())
+    for index in range(houses):
+        house_id = f"{100000 + index}"
+        params = {
+            "houseId": house_id,
+            "params[beginMonth]": begin,
+            "params[endMonth]": end,
+        }
+        bills = {"code": 200, "msg": "查询成功", "rows": make_rows(rows, seed=index)}
+        capture.record(API_BASE_URL, params, 200, bills, 0.05)
+        capture.record(
+            API_HOUSE_URL.format(house_id=house_id),
+            None,
+            200,
+            make_house(house_id, seed=index),
+            0.03,
+        )
+    return capture
+
+
+class _Entities:
+    """The sensors of one house, updated like CoordinatorEntity does."""
+
+    def __init__(self, coordinator: SQZLSWaterDataUpdateCoordinator) -> None:
+        """Create the sensors and follow the coordinator."""
+        self.sensors = [SQZLSWaterSensor(kind, coordinator) for kind in SENSOR_TYPES]
+        self.sensors += [
+            SQZLSWaterEstimateSensor(kind, coordinator) for kind in TARIFF_SENSOR_TYPES
+        ]
+        self.sensors.append(SQZLSWaterHistorySensor(coordinator))
+        self.writes = 0
+        coordinator.async_add_listener(self._handle_update)
+
+    def _handle_update(self) -> None:
+        for sensor in self.sensors:
+            state_key = sensor._state_key()  # noqa: SLF001
+            if state_key == sensor._written_state:  # noqa: SLF001
+                continue
+            sensor._written_state = state_key  # noqa: SLF001
+            if isinstance(sensor, SQZLSWaterHistorySensor):
+                sensor._attrs = None  # noqa: SLF001
+            # What async_write_ha_state reads
+            sensor.native_value  # noqa: B018
+            sensor.extra_state_attributes  # noqa: B018
+            self.writes += 1
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    """Summarize samples in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def _refresh_all(
+    coordinators: list[SQZLSWaterDataUpdateCoordinator],
+) -> tuple[float, list[float]]:
+    """Refresh every coordinator one after another; return wall and per-house."""
+    durations = []
+    start = time.perf_counter()
+    for coordinator in coordinators:
+        refresh_start = time.perf_counter()
+        await coordinator.async_refresh()
+        durations.append(time.perf_counter() - refresh_start)
+    return time.perf_counter() - start, durations
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    """Replay the capture and return the results."""
+    if args.capture:
+        header, exchanges = load_capture(args.capture)
+    else:
+        capture = synthetic_capture(args.houses, args.rows)
+        if args.save:
+            capture.save(args.save)
+        header, exchanges = {"created": capture.created}, capture.exchanges
+
+    session = ReplaySession(exchanges, latency=args.latency)
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        client = SQZLSWaterApiClient(session, cache_ttl=0)
+        coordinators = [
+            SQZLSWaterDataUpdateCoordinator(
+                hass, house_id, 7200, client, SQZLSWaterStore(hass, house_id)
+            )
+            for house_id in session.houses
+        ]
+        entities = [_Entities(coordinator) for coordinator in coordinators]
+
+        wall, durations = await _refresh_all(coordinators)
+        failed = sum(not coordinator.last_update_success for coordinator in coordinators)
+        results.append(
+            {
+                "benchmark": "replay_cold",
+                "houses": len(coordinators),
+                "failed": failed,
+                "refreshes_per_second": round(len(coordinators) / wall, 1),
+                "sensor_writes": sum(entity.writes for entity in entities),
+                **_summary(durations),
+            }
+        )
+
+        steady: list[float] = []
+        writes_before = sum(entity.writes for entity in entities)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            steady += (await _refresh_all(coordinators))[1]
+        wall = time.perf_counter() - start
+        results.append(
+            {
+                "benchmark": "replay_steady",
+                "houses": len(coordinators),
+                "iterations": args.iterations,
+                "refreshes_per_second": round(len(steady) / wall, 1),
+                "sensor_writes": sum(entity.writes for entity in entities)
+                - writes_before,
+                **_summary(steady),
+            }
+        )
+        await hass.async_stop(force=True)
+
+    meta = {
+        "python": sys.version.split()[0],
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "capture_created": header.get("created"),
+        "exchanges": len(exchanges),
+        "replayed_requests": session.requests,
+        "params": {
+            **vars(args),
+            "capture": str(args.capture) if args.capture else None,
+            "save": None,
+            "output": None,
+        },
+    }
+    return [{**result, "meta": meta} for result in results]
+
+
+def main() -> None:
+    """Parse arguments, run the replay and emit JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capture", type=pathlib.Path, help="capture file to replay")
+    parser.add_argument("--houses", type=int, default=50, help="synthetic houses")
+    parser.add_argument("--rows", type=int, default=24, help="synthetic rows per house")
+    parser.add_argument("--save", type=pathlib.Path, help="write the synthetic capture")
+    parser.add_argument("--iterations", type=int, default=5, help="steady rounds")
+    parser.add_argument(
+        "--latency", action="store_true", help="wait the recorded latency"
+    )
+    parser.add_argument("--output", type=pathlib.Path, help="write JSON results here")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
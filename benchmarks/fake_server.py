@@ -0,0 +1,151 @@
+"""Local stand-in for the sqzls.com listByMonth and house/{id} endpoints.
+
+Run it standalone and point the integration at it, or use create_app() /
+FakeServer from a benchmark:
+
+    python benchmarks/fake_server.py --port 8765 --rows 120 --latency 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import json
+import random
+import zlib
+
+from aiohttp import web
+
+from synthetic import make_house, make_rows
+
+BILLS_PATH = "/api/market/bill/listByMonth"
+HOUSE_PATH = "/api/market/house/{house_id}"
+
+
+@dataclass
+class FakeServerConfig:
+    """Behaviour of the fake server; may be changed while it runs."""
+
+    latency: float = 0.0  # seconds added to every response
+    latency_jitter: float = 0.0  # +/- seconds of random extra latency
+    error_rate: float = 0.0  # fraction of requests answered with HTTP 503
+    rows: int = 24  # listByMonth rows per house
+    padding: int = 0  # extra bytes per row, to grow the payload
+    seed: int = 0
+    requests: dict[str, int] = field(default_factory=dict)
+
+
+def _filter_rows(rows: list[dict], begin: str | None, end: str | None) -> list[dict]:
+    """Apply the beginMonth/endMonth query window."""
+    return [
+        row
+        for row in rows
+        if (not begin or row["month"] >= begin[:7]) and (not end or row["month"][:7] <= end[:7])
+    ]
+
+
+def create_app(config: FakeServerConfig) -> web.Application:
+    """Create the aiohttp application."""
+    rng = random.Random(config.seed)
+    payload_cache: dict[tuple[str, int, int], list[dict]] = {}
+
+    async def _delay_or_fail(endpoint: str) -> web.Response | None:
+        config.requests[endpoint] = config.requests.get(endpoint, 0) + 1
+        delay = config.latency + rng.uniform(-1, 1) * config.latency_jitter
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if rng.random() < config.error_rate:
+            return web.Response(status=503, text="Service Unavailable")
+        return None
+
+    async def bills(request: web.Request) -> web.Response:
+        if (error := await _delay_or_fail("bills")) is not None:
+            return error
+        house_id = request.query.get("houseId", "")
+        key = (house_id, config.rows, config.padding)
+        if (rows := payload_cache.get(key)) is None:
+            rows = make_rows(config.rows, seed=zlib.crc32(house_id.encode()))
+            if config.padding:
+                for row in rows:
+                    row["remark"] = "x" * config.padding
+            payload_cache[key] = rows
+        selected = _filter_rows(
+            rows,
+            request.query.get("params[beginMonth]"),
+            request.query.get("params[endMonth]"),
+        )
+        body = {"code": 200, "msg": "查询成功", "total": len(selected), "rows": selected}
+        return web.Response(
+            body=json.dumps(body, ensure_ascii=False).encode(),
+            content_type="application/json",
+        )
+
+    async def house(request: web.Request) -> web.Response:
+        if (error := await _delay_or_fail("house")) is not None:
+            return error
+        return web.json_response(make_house(request.match_info["house_id"]))
+
+    app = web.Application()
+    app.router.add_get(BILLS_PATH, bills)
+    app.router.add_get(HOUSE_PATH, house)
+    return app
+
+
+class FakeServer:
+    """Run the fake server on a local port inside an event loop."""
+
+    def __init__(self, config: FakeServerConfig | None = None, port: int = 0) -> None:
+        """Initialize the server."""
+        self.config = config or FakeServerConfig()
+        self._port = port
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @property
+    def bills_url(self) -> str:
+        """Return the listByMonth URL."""
+        return self.base_url + BILLS_PATH
+
+    @property
+    def house_url(self) -> str:
+        """Return the house URL template."""
+        return self.base_url + HOUSE_PATH
+
+    async def __aenter__(self) -> FakeServer:
+        """Start listening."""
+        self._runner = web.AppRunner(create_app(self.config), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self._port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # noqa: SLF001
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        """Stop listening."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def main() -> None:
+    """Run the fake server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--padding", type=int, default=0)
+    args = parser.parse_args()
+    config = FakeServerConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        rows=args.rows,
+        padding=args.padding,
+    )
+    web.run_app(create_app(config), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Synthetic sqzls.com payloads shared by the benchmarks and the fake server."""
+from __future__ import annotations
+
+import datetime
+import random
+from typing import Any
+
+
+def make_rows(
+    count: int, seed: int = 0, end: tuple[int, int] | None = None
+) -> list[dict[str, Any]]:
+    """Build listByMonth rows, one per month, oldest first.
+
+    The last row is the month `end` (year, month), by default the current one.
+    """
+    if end is None:
+        today = datetime.date.today()
+        end = (today.year, today.month)
+    first = end[0] * 12 + end[1] - 1 - (count - 1)
+    rng = random.Random(seed)
+    rows = []
+    reading = 0.0
+    for index in range(count):
+        year, month = divmod(first + index, 12)
+        month += 1
+        quantity = round(rng.uniform(0, 30), 2)
+        last_reading, reading = reading, reading + quantity
+        amount = round(quantity * 3.45, 2)
+        is_paid = rng.random() > 0.05
+        rows.append(
+            {
+                "month": f"{year}-{month:02d}-01",
+                "quantity": str(quantity),
+                "amount": amount,
+                "payableAmount": amount,
+                "paidAmount": amount if is_paid else 0,
+                "isPaid": is_paid,
+                "meterIndex": round(reading, 2),
+                "lastMeterIndex": round(last_reading, 2),
+                "unitPrice": "3.45",
+                "meterId": "M0001",
+                "costCategoryName": "居民生活用水",
+            }
+        )
+    return rows
+
+
+def make_house(house_id: str, seed: int = 0) -> dict[str, Any]:
+    """Build a house/{id} payload."""
+    rng = random.Random(seed)
+    return {
+        "code": 200,
+        "msg": "操作成功",
+        "data": {
+            "id": house_id,
+            "name": f"测试用户{house_id}",
+            "address": f"测试小区{rng.randint(1, 30)}栋{rng.randint(101, 2802)}",
+            "customer": {"balance": round(rng.uniform(-50, 500), 2)},
+        },
+    }
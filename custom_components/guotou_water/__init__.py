@@ -2,38 +2,73 @@
 from __future__ import annotations
 
 import asyncio
+from collections import OrderedDict
 import datetime
 import logging
 import pathlib
+import time
 from datetime import timedelta
+from typing import Any
 
-import aiohttp
 from async_timeout import timeout
 
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.json import json_bytes
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.components.frontend import add_extra_js_url
 from homeassistant.components.http import StaticPathConfig
 
+from .adaptive import AdaptivePollPolicy
+from .analytics import ConsumptionAnalytics
+from .api import (
+    SQZLSWaterApiClient,
+    SQZLSWaterApiError,
+    async_close_session,
+    async_get_client,
+)
 from .const import (
     DOMAIN,
+    CONF_ADAPTIVE_POLLING,
+    CONF_FLEET,
+    CONF_HISTORY_FORMAT,
     CONF_HOUSE_ID,
+    CONF_METER_ENTITY,
     CONF_UPDATE_INTERVAL,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_HISTORY_FORMAT,
     DEFAULT_UPDATE_INTERVAL,
-    API_BASE_URL,
-    API_HOUSE_URL,
+    PARSE_EXECUTOR_MIN_ROWS,
+    REFRESH_TIMEOUT,
+    VIEW_MODEL_CACHE_SIZE,
     COORDINATOR,
+    UNDO_CLIENT,
+    UNDO_FLEET,
+    UNDO_SCHEDULER,
     UNDO_UPDATE_LISTENER,
 )
+from .fleet import async_get_fleet
+from .history import HistorySnapshot
+from .metrics import RefreshMetrics, RequestTiming
+from .parser import BillAggregate, BillSummary
+from .scheduler import async_get_scheduler
+from .services import async_register_services
+from .statistics import async_import_statistics
+from .store import SQZLSWaterStore, async_pop_validation
+from .tariff import BillEstimator
+from .view_model import build_calendar, build_view_model
+from .websocket import async_register_websocket_commands
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
 
+# Payload keys filled from the house info endpoint
+HOUSE_FIELDS = ("balance", "customer_name", "address")
+
 CARD_URL = "/guotou_water/water-info-card.js"
 CARD_REGISTERED_KEY = f"{DOMAIN}_card_registered"
 
@@ -41,6 +76,8 @@ CARD_REGISTERED_KEY = f"{DOMAIN}_card_registered"
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the Guotou Water component."""
     hass.data.setdefault(DOMAIN, {})
+    async_register_websocket_commands(hass)
+    async_register_services(hass)
     return True
 
 
@@ -48,6 +85,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up SQZLS Water from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
+    if entry.data.get(CONF_FLEET):
+        # 汇总设备没有自己的协调器，只创建汇总传感器
+        hass.data[DOMAIN][entry.entry_id] = {}
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+        return True
+
     # 自动注册前端卡片资源
     if not hass.data.get(CARD_REGISTERED_KEY):
         card_path = pathlib.Path(__file__).parent / "www" / "water-info-card.js"
@@ -61,21 +104,49 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     house_id = entry.data[CONF_HOUSE_ID]
     update_interval = entry.options.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL)
-
+    adaptive = entry.options.get(CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING)
+    history_format = entry.options.get(CONF_HISTORY_FORMAT, DEFAULT_HISTORY_FORMAT)
+    meter_entity = entry.options.get(CONF_METER_ENTITY)
+
+    client = async_get_client(hass)
+    scheduler = async_get_scheduler(hass)
+    store = SQZLSWaterStore(hass, house_id)
+    await store.async_load()
     coordinator = SQZLSWaterDataUpdateCoordinator(
-        hass, house_id, update_interval
+        hass,
+        house_id,
+        update_interval,
+        client,
+        store,
+        adaptive,
+        history_format,
+        meter_entity,
     )
 
-    await coordinator.async_config_entry_first_refresh()
-
-    if not coordinator.last_update_success:
-        raise ConfigEntryNotReady
+    if store.snapshot:
+        # 先用上次成功的数据启动实体，刷新交给调度器批量进行
+        await coordinator.async_restore_snapshot(store.snapshot)
+        undo_schedule = scheduler.async_register(coordinator, refresh_now=True)
+    else:
+        if (validation := async_pop_validation(hass, house_id)) is not None:
+            # 复用配置流程中已下载的账单，首次刷新只请求余额
+            coordinator.async_use_prefetched_bills(*validation)
+        async with scheduler.slot():
+            await coordinator.async_config_entry_first_refresh()
+
+        if not coordinator.last_update_success:
+            raise ConfigEntryNotReady
+        undo_schedule = scheduler.async_register(coordinator, refresh_now=False)
 
     undo_listener = entry.add_update_listener(update_listener)
 
     hass.data[DOMAIN][entry.entry_id] = {
         COORDINATOR: coordinator,
         UNDO_UPDATE_LISTENER: undo_listener,
+        UNDO_SCHEDULER: undo_schedule,
+        UNDO_CLIENT: client.async_track_house(house_id),
+        # Every house feeds the fleet rollup, whether or not it is shown
+        UNDO_FLEET: async_get_fleet(hass).async_track(coordinator),
     }
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
@@ -94,17 +165,42 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         )
     )
 
-    hass.data[DOMAIN][entry.entry_id][UNDO_UPDATE_LISTENER]()
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    for undo in (UNDO_UPDATE_LISTENER, UNDO_SCHEDULER, UNDO_CLIENT, UNDO_FLEET):
+        if undo in entry_data:
+            entry_data[undo]()
 
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
 
+        # 最后一个条目卸载后关闭共享连接池
+        if not any(
+            other.state is ConfigEntryState.LOADED
+            for other in hass.config_entries.async_entries(DOMAIN)
+            if other.entry_id != entry.entry_id
+        ):
+            await async_close_session(hass)
+
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored bill history when an entry is deleted."""
+    if entry.data.get(CONF_FLEET):
+        return
+    await SQZLSWaterStore(hass, entry.data[CONF_HOUSE_ID]).async_remove()
+
+
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle options update."""
-    await hass.config_entries.async_reload(entry.entry_id)
+    """Apply changed options to the running coordinator, without a reload."""
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    coordinator.async_apply_options(
+        entry.options.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL),
+        entry.options.get(CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING),
+        entry.options.get(CONF_HISTORY_FORMAT, DEFAULT_HISTORY_FORMAT),
+        entry.options.get(CONF_METER_ENTITY),
+    )
+    async_get_scheduler(hass).async_reschedule(coordinator)
 
 
 class SQZLSWaterDataUpdateCoordinator(DataUpdateCoordinator):
@@ -115,47 +211,343 @@ class SQZLSWaterDataUpdateCoordinator(DataUpdateCoordinator):
         hass: HomeAssistant,
         house_id: str,
         update_interval_seconds: int,
+        client: SQZLSWaterApiClient,
+        store: SQZLSWaterStore,
+        adaptive: bool = False,
+        history_format: str = DEFAULT_HISTORY_FORMAT,
+        meter_entity: str | None = None,
     ):
         """Initialize the coordinator."""
-        update_interval = timedelta(seconds=update_interval_seconds)
-        _LOGGER.debug("Data will be updated every %s", update_interval)
-
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=update_interval)
+        self.poll_interval = timedelta(seconds=update_interval_seconds)
+        _LOGGER.debug("Data will be updated every %s", self.poll_interval)
+
+        # Polling is driven by the shared SQZLSWaterScheduler; listeners are
+        # only called when the returned data object actually changes
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=None,
+            always_update=False,
+        )
 
         self.house_id = house_id
+        self.client = client
+        self.store = store
+        # True while data comes from the on-disk snapshot
+        self.stale = False
+        self.poll_policy = (
+            AdaptivePollPolicy(store.change_days) if adaptive else None
+        )
+        self.history_format = history_format
+        # monthly_history as published to every consumer; replaced (with a
+        # higher version) only when its content changes
+        self.history = HistorySnapshot(house_id, 0)
+        # Local sensor with the meter index, and the tariff fitted to the history
+        self.meter_entity = meter_entity
+        self.billing = BillEstimator()
+        # Months changed since the last statistics import; the recorder itself
+        # is asked which months it holds
+        self._statistics_synced = False
+        self._statistics_months: set[str] = set()
+        # Keys changed by the last refresh, and when the API was last queried
+        self.changed_keys: frozenset[str] = frozenset()
+        self.last_fetch: str | None = None
+        # Timings and counters for diagnostics and the diagnostic sensors
+        self.metrics = RefreshMetrics()
+        # Card view model, rebuilt when the history or the current month changes
+        self.view_model: dict[str, Any] | None = None
+        self.view_version = 0
+        # Calendar year -> serialized view model result of the current version
+        self._view_json: OrderedDict[int, bytes] = OrderedDict()
+        # Seasonal baselines, forecast and anomaly score of monthly_history
+        self.analytics = ConsumptionAnalytics()
+        # Stored rows aggregated incrementally, and the months merged since
+        # the analytics last saw the history
+        self._aggregate = BillAggregate()
+        self._history_months: set[str] = set()
+        # Responses and store revision the current data was built from
+        self._built_from: tuple | None = None
+        # listByMonth response to use instead of the next bills request
+        self._prefetched_bills: dict | None = None
+        # Refresh in flight, shared by concurrent callers
+        self._refresh_task: asyncio.Task | None = None
+
+    async def async_refresh(self) -> None:
+        """Refresh data; callers arriving meanwhile share the same refresh."""
+        if self._refresh_task is None:
+            self._refresh_task = self.hass.async_create_task(
+                super().async_refresh(), f"{DOMAIN}_refresh_{self.house_id}"
+            )
+            self._refresh_task.add_done_callback(self._refresh_done)
+        await asyncio.shield(self._refresh_task)
+
+    @callback
+    def _refresh_done(self, _task: asyncio.Task) -> None:
+        """Allow the next refresh to start."""
+        self._refresh_task = None
+
+    @callback
+    def async_apply_options(
+        self,
+        update_interval_seconds: int,
+        adaptive: bool,
+        history_format: str,
+        meter_entity: str | None = None,
+    ) -> None:
+        """Apply changed options in place, keeping the data and entities."""
+        self.poll_interval = timedelta(seconds=update_interval_seconds)
+        if adaptive != (self.poll_policy is not None):
+            self.poll_policy = (
+                AdaptivePollPolicy(self.store.change_days) if adaptive else None
+            )
+        if (history_format, meter_entity) != (self.history_format, self.meter_entity):
+            self.history_format = history_format
+            self.meter_entity = meter_entity
+            # Only the history and estimate sensors' state keys depend on these
+            self.async_update_listeners()
+        _LOGGER.debug(
+            "Options of house %s applied: every %s, adaptive=%s, history=%s, "
+            "meter=%s",
+            self.house_id,
+            self.poll_interval,
+            adaptive,
+            history_format,
+            meter_entity,
+        )
+
+    def next_refresh_interval(self) -> float:
+        """Return the seconds until this house should be polled again."""
+        base = self.poll_interval.total_seconds()
+        if self.poll_policy is None:
+            return base
+        return self.poll_policy.next_interval(datetime.datetime.now(), base)
+
+    async def async_restore_snapshot(self, snapshot: dict) -> None:
+        """Serve the last known good payload until a real refresh lands.
+
+        The snapshot holds no monthly_history; it is aggregated again from
+        the stored bills, the rows the snapshot was built from.
+        """
+        self.stale = True
+        bills = self.store.bills
+        self.store.changed_months = set()
+        rows = dict(bills)
+        if len(rows) >= PARSE_EXECUTOR_MIN_ROWS:
+            await self.hass.async_add_executor_job(self._aggregate.update, rows)
+        else:
+            self._aggregate.update(rows)
+        self._history_months |= rows.keys()
+        snapshot = {**snapshot, "monthly_history": self._aggregate.history}
+        self._update_history(snapshot)
+        # 恢复的月份不算作变化，记录器中已有的统计在首次导入时核对
+        self._statistics_months = set()
+        self._update_view_model(True)
+        self.data = {
+            **snapshot,
+            **self.analytics.evaluate(snapshot, datetime.datetime.now()),
+        }
+        _LOGGER.debug(
+            "Restored snapshot for house %s from %s",
+            self.house_id,
+            snapshot.get("querytime"),
+        )
+
+    @callback
+    def async_use_prefetched_bills(
+        self, window: tuple[str, str], response: dict
+    ) -> None:
+        """Seed the first refresh with a listByMonth response fetched earlier.
+
+        If the response covers exactly the window the refresh would request,
+        the bills call is skipped; otherwise its rows are stored and only
+        the months still missing are requested.
+        """
+        if window == self.store.sync_window(datetime.datetime.now()):
+            self._prefetched_bills = response
+        else:
+            self.store.async_merge_bills(response.get("rows", []))
+
+    @property
+    def history_version(self) -> int:
+        """Return the version of the published history."""
+        return self.history.version
+
+    def _update_history(self, data: dict) -> bool:
+        """Publish a new history snapshot if the content changed.
+
+        data["monthly_history"] is replaced by the snapshot's entries either
+        way, so an unchanged history is not held twice and every payload
+        shares the published entries. Returns True if it changed.
+        """
+        history = data.get("monthly_history", ())
+        months, self._history_months = self._history_months, set()
+        changed = not self.history.version
+        if history is not self.history.entries:
+            history = tuple(history)
+            changed = changed or history != self.history.entries
+        if changed:
+            self.history = HistorySnapshot(
+                self.house_id, self.history.version + 1, history
+            )
+            self.analytics.update(self.history.entries, months)
+            self._statistics_months |= months
+            self.billing.update(self.history.entries)
+        data["monthly_history"] = self.history.entries
+        return changed
+
+    def _update_view_model(self, history_changed: bool) -> bool:
+        """Rebuild the card view model if its content may have changed.
+
+        Besides the history, the chart window depends on the current month.
+        """
+        now = datetime.datetime.now()
+        if (
+            not history_changed
+            and self.view_model is not None
+            and self.view_model["month"] == f"{now.year}-{now.month:02d}"
+        ):
+            return False
+        self.view_version += 1
+        self.view_model = build_view_model(
+            self.history.entries, now, self.view_version
+        )
+        self._view_json.clear()
+        return True
+
+    def view_model_json(self, year: int) -> bytes:
+        """Return the view model with the calendar of one year, serialized.
+
+        Only the requested year's grid is built, from that year's slice of
+        the history snapshot; each year is encoded once per version.
+        """
+        if (cached := self._view_json.get(year)) is not None:
+            self._view_json.move_to_end(year)
+            return cached
+        entries = self.history.range(f"{year:04d}-01", f"{year:04d}-12")
+        payload = json_bytes(
+            {
+                "version": self.view_version,
+                "view_model": {
+                    **self.view_model,
+                    "calendar": {str(year): build_calendar(entries)},
+                },
+            }
+        )
+        self._view_json[year] = payload
+        if len(self._view_json) > VIEW_MODEL_CACHE_SIZE:
+            self._view_json.popitem(last=False)
+        return payload
 
     async def _async_update_data(self) -> dict:
         """Fetch data from SQZLS Water API."""
+        start = time.perf_counter()
         try:
-            async with timeout(60):
-                return await self._fetch_water_data()
+            return await self._async_refresh_data()
+        finally:
+            self.metrics.refresh_ms.add((time.perf_counter() - start) * 1000)
+            # Diagnostic sensors update even when the data itself is unchanged
+            self.metrics.async_notify()
+
+    async def _async_refresh_data(self) -> dict:
+        """Fetch, merge and compare one refresh worth of data."""
+        try:
+            async with timeout(REFRESH_TIMEOUT):
+                data, complete = await self._fetch_water_data()
         except Exception as error:
-            raise UpdateFailed(f"Error fetching data: {error}") from error
-
-    async def _fetch_water_data(self) -> dict:
-        """Fetch water usage data from the API."""
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Accept": "application/json",
+            self.metrics.refresh_failures += 1
+            if self.data is None:
+                raise UpdateFailed(f"Error fetching data: {error}") from error
+            # Stale-while-revalidate: keep serving the last good values
+            _LOGGER.warning(
+                "Error fetching data for house %s, keeping last values: %s",
+                self.house_id,
+                error,
+            )
+            if not self.stale:
+                self.stale = True
+                self.async_update_listeners()
+            return self.data
+
+        was_stale, self.stale = self.stale, not complete
+        self.last_fetch = data["querytime"]
+        history_changed = self._update_history(data)
+        view_changed = self._update_view_model(history_changed)
+        data.update(self.analytics.evaluate(data, datetime.datetime.now()))
+        if (
+            history_changed or not self._statistics_synced
+        ) and "recorder" in self.hass.config.components:
+            # 首次刷新时按记录器已有的数据补全，之后只在历史变化时写入；失败时下次刷新重试
+            try:
+                await async_import_statistics(
+                    self.hass,
+                    self.house_id,
+                    data["monthly_history"],
+                    self._statistics_months,
+                )
+            except Exception as error:  # noqa: BLE001
+                _LOGGER.warning(
+                    "Error importing statistics for house %s: %s",
+                    self.house_id,
+                    error,
+                )
+            else:
+                self._statistics_synced = True
+                self._statistics_months = set()
+        if self.poll_policy is not None and self.poll_policy.observe(
+            data, datetime.datetime.now()
+        ):
+            self.store.async_save_change_days(self.poll_policy.change_days)
+
+        previous = self.data
+        self.changed_keys = self._changed_keys(previous, data, history_changed)
+        if view_changed:
+            self.changed_keys |= {"view_model"}
+        if previous is not None and not self.changed_keys and was_stale == self.stale:
+            # 数据未变化：沿用旧数据对象 (含旧 querytime)，
+            # always_update=False 时协调器不会通知实体
+            return previous
+
+        self.store.async_save_snapshot(data)
+        return data
+
+    @staticmethod
+    def _changed_keys(
+        previous: dict | None, data: dict, history_changed: bool
+    ) -> frozenset[str]:
+        """Return the keys whose value differs from the previous payload."""
+        if previous is None:
+            return frozenset(data)
+        changed = {
+            key
+            for key, value in data.items()
+            if key not in ("querytime", "monthly_history") and previous.get(key) != value
         }
+        if history_changed:
+            changed.add("monthly_history")
+        return frozenset(changed)
+
+    async def _fetch_water_data(self) -> tuple[dict, bool]:
+        """Fetch water usage data from the API.
 
+        Returns the payload and whether both endpoints answered. A failed
+        endpoint is filled from the last good data; values that were never
+        received stay None ("no data"), unlike a real zero usage.
+        """
         now = datetime.datetime.now()
-        current_year = now.year
-        current_month = now.month
-        
-        # Query from last year January to next month
-        begin_month = f"{current_year - 1}-01-01"
-        end_month = f"{current_year + 1}-01-31"
+
+        # 已结清的月份保存在本地，只请求当前月及未缴费月份
+        begin_month, end_month = self.store.sync_window(now)
 
         result_data = {
-            "current_reading": 0.0,
-            "yearly_volume": 0.0,
-            "yearly_amount": 0.0,
-            "monthly_volume": 0.0,
-            "monthly_amount": 0.0,
-            "unpaid_amount": 0.0,
-            "unit_price": 0.0,
-            "balance": 0.0,
+            "current_reading": None,
+            "yearly_volume": None,
+            "yearly_amount": None,
+            "monthly_volume": None,
+            "monthly_amount": None,
+            "unpaid_amount": None,
+            "unit_price": None,
+            "balance": None,
             "querytime": now.isoformat(),
             "house_id": self.house_id,
             # Historical data for charts and calendar display
@@ -167,112 +559,140 @@ class SQZLSWaterDataUpdateCoordinator(DataUpdateCoordinator):
             "address": None,
         }
 
-        params = {
-            "houseId": self.house_id,
-            "params[beginMonth]": begin_month,
-            "params[endMonth]": end_month,
-        }
-
-        connector = aiohttp.TCPConnector(limit=5)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            try:
-                async with session.get(
-                    API_BASE_URL,
-                    headers=headers,
-                    params=params,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        json_data = await response.json()
-                        
-                        if json_data.get("code") == 200:
-                            rows = json_data.get("rows", [])
-                            
-                            if rows:
-                                # Sort by month descending to get latest first
-                                rows_sorted = sorted(rows, key=lambda x: x.get("month", ""), reverse=True)
-                                
-                                # Get latest record for current reading and meter info
-                                latest = rows_sorted[0]
-                                result_data["current_reading"] = float(latest.get("meterIndex", 0) or 0)
-                                result_data["meter_id"] = latest.get("meterId")
-                                result_data["cost_category"] = latest.get("costCategoryName")
-                                result_data["unit_price"] = float(latest.get("unitPrice", 0) or 0)
-                                
-                                # Calculate yearly totals (current year)
-                                yearly_vol = 0.0
-                                yearly_amt = 0.0
-                                unpaid_total = 0.0
-                                monthly_history = []
-                                
-                                for row in rows:
-                                    month_str = row.get("month", "")
-                                    quantity = float(row.get("quantity", 0) or 0)
-                                    amount = float(row.get("amount", 0) or 0)
-                                    payable = float(row.get("payableAmount", 0) or 0)
-                                    paid = float(row.get("paidAmount", 0) or 0)
-                                    is_paid = row.get("isPaid", True)
-                                    
-                                    # Check if this month is in current year
-                                    if month_str.startswith(str(current_year)):
-                                        yearly_vol += quantity
-                                        yearly_amt += amount
-                                    
-                                    # Check unpaid
-                                    if not is_paid:
-                                        unpaid_total += (payable - paid)
-                                    
-                                    # Build monthly history
-                                    if month_str and quantity > 0:
-                                        monthly_history.append({
-                                            "date": month_str,
-                                            "volume": round(quantity, 2),
-                                            "amount": round(amount, 2),
-                                            "reading": float(row.get("meterIndex", 0) or 0),
-                                            "last_reading": float(row.get("lastMeterIndex", 0) or 0),
-                                            "unit_price": float(row.get("unitPrice", 0) or 0),
-                                            "is_paid": is_paid,
-                                        })
-                                
-                                result_data["yearly_volume"] = round(yearly_vol, 2)
-                                result_data["yearly_amount"] = round(yearly_amt, 2)
-                                result_data["unpaid_amount"] = round(unpaid_total, 2)
-                                
-                                # Get current month data
-                                current_month_str = f"{current_year}-{current_month:02d}-01"
-                                for row in rows:
-                                    if row.get("month", "") == current_month_str:
-                                        result_data["monthly_volume"] = round(float(row.get("quantity", 0) or 0), 2)
-                                        result_data["monthly_amount"] = round(float(row.get("amount", 0) or 0), 2)
-                                        break
-                                
-                                # Sort history by date
-                                monthly_history.sort(key=lambda x: x["date"])
-                                result_data["monthly_history"] = monthly_history
-                                
-            except asyncio.TimeoutError:
-                _LOGGER.warning("Timeout fetching water data")
-            except Exception as e:
-                _LOGGER.warning("Error fetching water data: %s", e)
-                raise
-
-            # Fetch balance from house info API
+        bills_timing, house_timing = RequestTiming(), RequestTiming()
+        prefetched, self._prefetched_bills = self._prefetched_bills, None
+        if prefetched is not None:
+            bills = prefetched
             try:
-                house_url = API_HOUSE_URL.format(house_id=self.house_id)
-                async with session.get(
-                    house_url,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        json_data = await response.json()
-                        if json_data.get("code") == 200:
-                            data = json_data.get("data", {})
-                            customer = data.get("customer", {})
-                            result_data["balance"] = float(customer.get("balance", 0) or 0)
-                            result_data["customer_name"] = data.get("name", "")
-                            result_data["address"] = data.get("address", "")
-            except Exception as e:
-                _LOGGER.warning("Error fetching balance data: %s", e)
-
-        return result_data
+                house = await self.client.async_get_house(self.house_id, house_timing)
+            except Exception as error:  # noqa: BLE001
+                house = error
+        else:
+            bills, house = await asyncio.gather(
+                self.client.async_get_bills(
+                    self.house_id, begin_month, end_month, bills_timing
+                ),
+                self.client.async_get_house(self.house_id, house_timing),
+                return_exceptions=True,
+            )
+
+        # 两个接口互不影响：任一失败只记录日志，全部失败才视为刷新失败
+        bills_ok = self._check_response("water", bills)
+        house_ok = self._check_response("balance", house)
+        if prefetched is None:
+            self.metrics.bills.record(
+                bills_timing, self._response_error(bills, bills_ok)
+            )
+        self.metrics.house.record(house_timing, self._response_error(house, house_ok))
+        if not bills_ok and not house_ok:
+            if isinstance(bills, BaseException):
+                raise bills
+            raise SQZLSWaterApiError("No valid response from sqzls.com")
+
+        state = (self.store.revision, now.year, now.month)
+        if (
+            bills_ok
+            and house_ok
+            and self.data is not None
+            and self._built_from is not None
+            and self._built_from[0] is bills
+            and self._built_from[1] is house
+            and self._built_from[2] == state
+        ):
+            # 接口返回的是缓存中的同一对象：跳过合并与解析
+            return {**self.data, "querytime": result_data["querytime"]}, True
+
+        if bills_ok:
+            self.store.async_merge_bills(bills.get("rows", []))
+
+        # The stored rows are the last good bill data; only the months merged
+        # since the last refresh are aggregated again
+        months, self.store.changed_months = self.store.changed_months, set()
+        bills = self.store.bills
+        if not len(self._aggregate):
+            # 首次汇总：全部月份交给分析 (从快照恢复时已在恢复中汇总)
+            months = set(bills)
+        self._history_months |= months
+        rows = {month: bills[month] for month in months}
+        parse_start = time.perf_counter()
+        if len(rows) >= PARSE_EXECUTOR_MIN_ROWS:
+            # 首次加载或补全的大量月份放到线程池，rows 是副本，不受并发合并影响
+            await self.hass.async_add_executor_job(self._aggregate.update, rows)
+        else:
+            self._aggregate.update(rows)
+        self._apply_bills(result_data, self._aggregate.summary(now.year, now.month))
+        self.metrics.parse_ms.add((time.perf_counter() - parse_start) * 1000)
+        self.metrics.rows.add(len(rows))
+
+        if house_ok:
+            self._apply_house(result_data, house)
+        elif self.data is not None:
+            for key in HOUSE_FIELDS:
+                result_data[key] = self.data.get(key)
+
+        if bills_ok and house_ok:
+            self._built_from = (
+                bills,
+                house,
+                (self.store.revision, now.year, now.month),
+            )
+        return result_data, bills_ok and house_ok
+
+    @staticmethod
+    def _check_response(kind: str, response: Any) -> bool:
+        """Return True for a successful API response, log anything else."""
+        if isinstance(response, asyncio.TimeoutError):
+            _LOGGER.warning("Timeout fetching %s data", kind)
+        elif isinstance(response, BaseException):
+            _LOGGER.warning("Error fetching %s data: %s", kind, response)
+        elif not response or response.get("code") != 200:
+            _LOGGER.warning(
+                "Unexpected %s response: %s",
+                kind,
+                response.get("msg") if response else "empty",
+            )
+        else:
+            return True
+        return False
+
+    @staticmethod
+    def _response_error(response: Any, ok: bool) -> BaseException | None:
+        """Return what made a response unusable, for the metrics."""
+        if ok:
+            return None
+        if isinstance(response, BaseException):
+            return response
+        return SQZLSWaterApiError(
+            f"code {response.get('code')}" if response else "empty response"
+        )
+
+    @staticmethod
+    def _apply_bills(result_data: dict, summary: BillSummary) -> None:
+        """Merge the summary of the stored listByMonth rows into result_data."""
+        latest = summary.latest
+        if latest is None:
+            return
+
+        # Latest record for current reading and meter info
+        result_data["current_reading"] = latest.reading
+        result_data["meter_id"] = latest.meter_id
+        result_data["cost_category"] = latest.cost_category
+        result_data["unit_price"] = latest.unit_price
+
+        result_data["yearly_volume"] = summary.yearly_volume
+        result_data["yearly_amount"] = summary.yearly_amount
+        result_data["unpaid_amount"] = summary.unpaid_amount
+        result_data["monthly_volume"] = summary.monthly_volume
+        result_data["monthly_amount"] = summary.monthly_amount
+        result_data["monthly_history"] = summary.history
+
+    @staticmethod
+    def _apply_house(result_data: dict, json_data: dict) -> None:
+        """Merge the house info response (balance, customer) into result_data."""
+        data = json_data.get("data", {})
+        customer = data.get("customer") or {}
+        # 缺少余额时为 unknown，而不是 0 元
+        balance = customer.get("balance")
+        result_data["balance"] = None if balance is None else float(balance)
+        result_data["customer_name"] = data.get("name", "")
+        result_data["address"] = data.get("address", "")
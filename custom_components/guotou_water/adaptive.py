@@ -0,0 +1,73 @@
+"""Billing-cycle-aware adaptive polling for SQZLS Water."""
+from __future__ import annotations
+
+import datetime
+from typing import Any
+
+from .const import (
+    ADAPTIVE_EVENT_WINDOW_DAYS,
+    ADAPTIVE_MAX_EVENTS,
+    ADAPTIVE_MAX_INTERVAL,
+    ADAPTIVE_UNPAID_FACTOR,
+)
+
+# Fields whose change means the utility published something new
+TRACKED_FIELDS = ("current_reading", "unpaid_amount", "balance")
+
+
+def _day_distance(day_a: int, day_b: int) -> int:
+    """Return the distance between two days of month, wrapping at month end."""
+    diff = abs(day_a - day_b) % 31
+    return min(diff, 31 - diff)
+
+
+class AdaptivePollPolicy:
+    """Learn on which days a house's data changes and poll around them.
+
+    Every unchanged poll doubles the interval, up to ADAPTIVE_MAX_INTERVAL.
+    Close to a day of month on which a change was seen before (bill
+    publication, payment) or while a bill is unpaid, the interval drops back
+    towards the configured one. The configured interval is never undercut.
+    """
+
+    def __init__(self, change_days: list[int] | None = None) -> None:
+        """Initialize the policy with previously learned change days."""
+        self.change_days: list[int] = list(change_days or [])
+        self._last_values: tuple[Any, ...] | None = None
+        self._unchanged_polls = 0
+        self._unpaid = False
+
+    def observe(self, data: dict[str, Any], now: datetime.datetime) -> bool:
+        """Record a fetched payload; return True if a tracked field changed."""
+        values = tuple(data.get(field) for field in TRACKED_FIELDS)
+        self._unpaid = bool(data.get("unpaid_amount"))
+
+        if self._last_values is None:
+            # First poll after startup only sets the baseline
+            self._last_values = values
+            return False
+
+        if values == self._last_values:
+            self._unchanged_polls += 1
+            return False
+
+        self._last_values = values
+        self._unchanged_polls = 0
+        self.change_days.append(now.day)
+        del self.change_days[:-ADAPTIVE_MAX_EVENTS]
+        return True
+
+    def next_interval(self, now: datetime.datetime, base: float) -> float:
+        """Return the seconds until the next poll."""
+        ceiling = max(base, ADAPTIVE_MAX_INTERVAL)
+
+        if any(
+            _day_distance(now.day, day) <= ADAPTIVE_EVENT_WINDOW_DAYS
+            for day in self.change_days
+        ):
+            return base
+
+        interval = min(base * 2 ** min(self._unchanged_polls, 16), ceiling)
+        if self._unpaid:
+            interval = min(interval, base * ADAPTIVE_UNPAID_FACTOR)
+        return max(base, interval)
@@ -0,0 +1,204 @@
+"""Incremental usage analytics: seasonal baselines, forecast and anomaly score."""
+from __future__ import annotations
+
+import bisect
+from collections.abc import Sequence
+import datetime
+import math
+from operator import itemgetter
+from typing import Any
+
+from .const import ANOMALY_MIN_SAMPLES, ANOMALY_MIN_STD, ANOMALY_STD_FLOOR
+
+
+_DATE = itemgetter("date")
+
+
+class _Moments:
+    """Count, sum and sum of squares that samples can be added to and removed from."""
+
+    __slots__ = ("count", "total", "squares")
+
+    def __init__(self) -> None:
+        """Initialize empty moments."""
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def add(self, value: float, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) one sample."""
+        self.count += sign
+        self.total += sign * value
+        self.squares += sign * value * value
+
+    def mean_std(self, exclude: float | None = None) -> tuple[float, float] | None:
+        """Return mean and standard deviation, optionally leaving one sample out."""
+        count, total, squares = self.count, self.total, self.squares
+        if exclude is not None:
+            count, total, squares = count - 1, total - exclude, squares - exclude**2
+        if count <= 0:
+            return None
+        mean = total / count
+        return mean, math.sqrt(max(0.0, squares / count - mean * mean))
+
+
+class ConsumptionAnalytics:
+    """Per-calendar-month usage statistics of one house.
+
+    Only months whose volume differs from what was seen before touch the
+    accumulators, and evaluation looks at no more than 24 months, so an
+    incremental update costs the same however long the history is.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self._volumes: dict[str, float] = {}
+        self._by_month = [_Moments() for _ in range(12)]
+        self._overall = _Moments()
+        self._latest = ""
+
+    def update(
+        self, history: Sequence[dict[str, Any]], months: set[str] | None = None
+    ) -> int:
+        """Apply new or changed months of monthly_history; return how many.
+
+        With `months` (dates merged since the last update) only those are
+        looked up in the sorted history; without it, or before the first
+        update, the whole history is scanned.
+        """
+        if months is None or not self._volumes:
+            changed = 0
+            for entry in history:
+                changed += self._set(entry["date"], entry["volume"])
+            return changed
+
+        changed = 0
+        for date in months:
+            index = bisect.bisect_left(history, date, key=_DATE)
+            if index < len(history) and history[index]["date"] == date:
+                changed += self._set(date, history[index]["volume"])
+            else:
+                # Months without usage are left out of monthly_history
+                changed += self._set(date, None)
+        return changed
+
+    def _set(self, date: str, volume: float | None) -> bool:
+        """Replace the sample of one month; return True if it changed."""
+        previous = self._volumes.get(date)
+        if previous == volume:
+            return False
+        moments = self._by_month[int(date[5:7]) - 1]
+        if previous is not None:
+            moments.add(previous, -1)
+            self._overall.add(previous, -1)
+        if volume is None:
+            del self._volumes[date]
+            if date == self._latest:
+                self._latest = max(self._volumes, default="")
+            return True
+        moments.add(volume)
+        self._overall.add(volume)
+        self._volumes[date] = volume
+        self._latest = max(self._latest, date)
+        return True
+
+    def expected(self, month: int) -> float | None:
+        """Return the baseline volume of a calendar month (1-12)."""
+        if (stats := self._by_month[month - 1].mean_std()) is not None:
+            return stats[0]
+        if (stats := self._overall.mean_std()) is not None:
+            return stats[0]
+        return None
+
+    def seasonal_profile(self) -> list[float | None]:
+        """Return each calendar month's mean relative to the overall mean."""
+        overall = self._overall.mean_std()
+        if overall is None or overall[0] <= 0:
+            return [None] * 12
+        return [
+            round(stats[0] / overall[0], 3)
+            if (stats := moments.mean_std()) is not None
+            else None
+            for moments in self._by_month
+        ]
+
+    def anomaly(self, date: str) -> tuple[float, float] | None:
+        """Return (z-score, baseline) of a month against the other samples.
+
+        The same calendar month of other years is preferred; with too few of
+        those, all other months are used.
+        """
+        volume = self._volumes.get(date)
+        if volume is None:
+            return None
+        for moments in (self._by_month[int(date[5:7]) - 1], self._overall):
+            if moments.count - 1 >= ANOMALY_MIN_SAMPLES:
+                mean, std = moments.mean_std(exclude=volume)
+                std = max(std, ANOMALY_STD_FLOOR * mean, ANOMALY_MIN_STD)
+                return (volume - mean) / std, mean
+        return None
+
+    def _trailing(self, year: int, month: int, months: int) -> float:
+        """Return the volume of `months` months ending with year-month."""
+        total = 0.0
+        for _ in range(months):
+            total += self._volumes.get(f"{year}-{month:02d}-01", 0.0)
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        return total
+
+    def evaluate(self, data: dict[str, Any], now: datetime.datetime) -> dict[str, Any]:
+        """Return the analytics payload keys for the coordinator data."""
+        result: dict[str, Any] = {
+            "forecast_yearly_volume": None,
+            "forecast_yearly_amount": None,
+            "monthly_baseline": None,
+            "usage_anomaly_score": None,
+            "analytics": {},
+        }
+        if not self._volumes:
+            return result
+
+        last_billed = max(
+            (
+                month
+                for month in range(1, 13)
+                if f"{now.year}-{month:02d}-01" in self._volumes
+            ),
+            default=0,
+        )
+        remaining = 0.0
+        for month in range(last_billed + 1, 13):
+            remaining += self.expected(month) or 0.0
+
+        yearly_volume = data.get("yearly_volume") or 0.0
+        yearly_amount = data.get("yearly_amount") or 0.0
+        unit_price = data.get("unit_price")
+        result["forecast_yearly_volume"] = round(yearly_volume + remaining, 2)
+        if unit_price:
+            result["forecast_yearly_amount"] = round(
+                yearly_amount + remaining * unit_price, 2
+            )
+
+        if (baseline := self.expected(now.month)) is not None:
+            result["monthly_baseline"] = round(baseline, 2)
+
+        latest = self._latest
+        details: dict[str, Any] = {
+            "months": len(self._volumes),
+            "remaining_months": 12 - last_billed,
+            "seasonal_profile": self.seasonal_profile(),
+            "trailing_12_volume": round(
+                self._trailing(now.year, now.month, 12), 2
+            ),
+            "previous_12_volume": round(
+                self._trailing(now.year - 1, now.month, 12), 2
+            ),
+            "anomaly_month": latest,
+        }
+        if (anomaly := self.anomaly(latest)) is not None:
+            score, expected = anomaly
+            result["usage_anomaly_score"] = round(score, 2)
+            details["anomaly_volume"] = self._volumes[latest]
+            details["anomaly_expected"] = round(expected, 2)
+        result["analytics"] = details
+        return result
@@ -0,0 +1,562 @@
+"""HTTP client for the SQZLS Water API."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from functools import partial
+import hashlib
+import logging
+import random
+import time
+from typing import Any
+
+from yarl import URL
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.util.json import json_loads
+
+from .const import (
+    API_BASE_URL,
+    API_CACHE_ENTRIES_PER_HOUSE,
+    API_CACHE_TTL,
+    API_HEADERS,
+    API_HOUSE_URL,
+    API_RETRY_ATTEMPTS,
+    API_RETRY_BASE_DELAY,
+    API_RETRY_MAX_DELAY,
+    API_TIMEOUT,
+    CAPTURE,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    CONNECTOR_DNS_CACHE_TTL,
+    CONNECTOR_KEEPALIVE_TIMEOUT,
+    CONNECTOR_LIMIT,
+    CONNECTOR_LIMIT_PER_HOST,
+    CLIENT,
+    DOMAIN,
+    JSON_EXECUTOR_MIN_BYTES,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_PER_SECOND,
+    SESSION,
+)
+from .capture import TrafficCapture
+from .metrics import RequestTiming, create_trace_config
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_get_session(hass: HomeAssistant) -> aiohttp.ClientSession:
+    """Return the pooled session shared by every SQZLS Water entry.
+
+    The session is created lazily so that the config flow and the coordinators
+    reuse the same keep-alive connections and DNS cache.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    session: aiohttp.ClientSession | None = domain_data.get(SESSION)
+    if session is not None and not session.closed:
+        return session
+
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTOR_LIMIT,
+        limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+        ttl_dns_cache=CONNECTOR_DNS_CACHE_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=CONNECTOR_KEEPALIVE_TIMEOUT,
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        headers=API_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=API_TIMEOUT),
+        trace_configs=[create_trace_config()],
+    )
+    domain_data[SESSION] = session
+
+    @callback
+    def _async_close_on_stop(event: Event) -> None:
+        """Close the session when Home Assistant shuts down."""
+        hass.async_create_task(async_close_session(hass))
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_on_stop)
+    _LOGGER.debug("Created pooled HTTP session for %s", DOMAIN)
+    return session
+
+
+@callback
+def async_get_client(hass: HomeAssistant) -> SQZLSWaterApiClient:
+    """Return the API client shared by every entry and the config flow."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    session = async_get_session(hass)
+    client: SQZLSWaterApiClient | None = domain_data.get(CLIENT)
+    if client is None or client.session is not session:
+        client = SQZLSWaterApiClient(
+            session, RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+        )
+        # A capture started before the session was recreated keeps recording
+        client.capture = domain_data.get(CAPTURE)
+        domain_data[CLIENT] = client
+    return client
+
+
+async def async_close_session(hass: HomeAssistant) -> None:
+    """Close the shared session if it exists."""
+    domain_data = hass.data.get(DOMAIN, {})
+    domain_data.pop(CLIENT, None)
+    session: aiohttp.ClientSession | None = domain_data.pop(SESSION, None)
+    if session is not None and not session.closed:
+        await session.close()
+        _LOGGER.debug("Closed pooled HTTP session for %s", DOMAIN)
+
+
+class SQZLSWaterApiError(Exception):
+    """Raised when a request to sqzls.com failed after all retries."""
+
+
+class CircuitOpenError(SQZLSWaterApiError):
+    """Raised without sending a request while the host is considered down."""
+
+
+class _RetryableStatusError(Exception):
+    """Response worth retrying: HTTP 429 or 5xx, a 5xx API code, or not JSON."""
+
+
+class CircuitBreaker:
+    """Stop calling a host after repeated failures.
+
+    After CIRCUIT_FAILURE_THRESHOLD failed requests in a row the circuit opens
+    and requests fail fast. Once CIRCUIT_RESET_TIMEOUT has passed a single
+    trial request is let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        """Initialize the breaker."""
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        if self.state == self.CLOSED:
+            return True
+        if (
+            self.state == self.OPEN
+            and time.monotonic() - self._opened_at >= self._reset_timeout
+        ):
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """Let another trial through after one ended without an outcome."""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """Count a failure and open the circuit if needed."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self._failure_threshold:
+            if self.state != self.OPEN:
+                _LOGGER.warning(
+                    "sqzls.com failed %s times in a row, pausing requests for %ss",
+                    self.failures,
+                    self._reset_timeout,
+                )
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class RateLimiter:
+    """Token bucket limiting the global request rate to sqzls.com."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize the limiter."""
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        loop = asyncio.get_running_loop()
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(
+                        self._burst, self._tokens + (now - self._updated) * self._rate
+                    )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class _CachedResponse:
+    """Decoded body of one (endpoint, params) and how to revalidate it."""
+
+    __slots__ = ("data", "digest", "etag", "last_modified", "fetched")
+
+    def __init__(
+        self,
+        data: dict[str, Any],
+        digest: bytes,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> None:
+        """Initialize the entry."""
+        self.data = data
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched = time.monotonic()
+
+
+class ResponseCache:
+    """Least recently used cache of decoded responses."""
+
+    def __init__(self, max_entries: int = API_CACHE_ENTRIES_PER_HOUSE) -> None:
+        """Initialize the cache."""
+        self._entries: OrderedDict[tuple, _CachedResponse] = OrderedDict()
+        self._max_entries = max_entries
+
+    def resize(self, max_entries: int) -> None:
+        """Change the capacity, evicting the least recently used entries."""
+        self._max_entries = max_entries
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: tuple) -> _CachedResponse | None:
+        """Return an entry and mark it as recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: _CachedResponse) -> None:
+        """Store an entry, evicting the least recently used ones."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self._entries)
+
+
+class SQZLSWaterApiClient:
+    """Thin wrapper around the two SQZLS Water endpoints.
+
+    Requests are retried with exponential backoff and jitter, and a circuit
+    breaker per host stops traffic while the server is down. The endpoint
+    URLs can be overridden to point the client at a local fake server.
+
+    Successful responses are cached per (endpoint, params): within cache_ttl
+    they are returned without a request, identical concurrent calls share
+    one request, and older entries are revalidated with a conditional
+    request or, if the server sends no validators, by comparing a digest
+    of the body. An unchanged response is returned as the very same dict,
+    which callers must treat as read-only. The cache holds a few entries
+    per tracked house; one-off requests such as backfill windows bypass it.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        rate_limiter: RateLimiter | None = None,
+        *,
+        bills_url: str = API_BASE_URL,
+        house_url: str = API_HOUSE_URL,
+        retry_attempts: int = API_RETRY_ATTEMPTS,
+        cache_ttl: float = API_CACHE_TTL,
+    ) -> None:
+        """Initialize the client."""
+        self.session = session
+        self._rate_limiter = rate_limiter
+        self._bills_url = bills_url
+        self._house_url = house_url
+        self._retry_attempts = retry_attempts
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._cache_ttl = cache_ttl
+        self.cache = ResponseCache()
+        # Houses polled through this client, which size the cache
+        self._houses: set[str] = set()
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        # Set by the start_capture service to record every response
+        self.capture: TrafficCapture | None = None
+
+    def breaker_states(self) -> dict[str, dict[str, Any]]:
+        """Return the circuit breaker state per host (for diagnostics)."""
+        return {
+            host: {"state": breaker.state, "failures": breaker.failures}
+            for host, breaker in self._breakers.items()
+        }
+
+    @callback
+    def async_track_house(self, house_id: str) -> CALLBACK_TYPE:
+        """Make room in the cache for a polled house; return the undo."""
+        self._houses.add(house_id)
+        self._resize_cache()
+
+        @callback
+        def _async_untrack() -> None:
+            self._houses.discard(house_id)
+            self._resize_cache()
+
+        return _async_untrack
+
+    def _resize_cache(self) -> None:
+        """Size the cache for the tracked houses."""
+        self.cache.resize(API_CACHE_ENTRIES_PER_HOUSE * max(1, len(self._houses)))
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        """Return the circuit breaker of the URL's host."""
+        host = URL(url).host or ""
+        if (breaker := self._breakers.get(host)) is None:
+            breaker = self._breakers[host] = CircuitBreaker()
+        return breaker
+
+    async def async_get_bills(
+        self,
+        house_id: str,
+        begin_month: str,
+        end_month: str,
+        timing: RequestTiming | None = None,
+        *,
+        cache: bool = True,
+    ) -> dict[str, Any] | None:
+        """Fetch the listByMonth bill rows, or None on a non-200 status.
+
+        With cache=False the response is neither served from nor stored in
+        the response cache, for windows that are requested only once.
+        """
+        params = {
+            "houseId": house_id,
+            "params[beginMonth]": begin_month,
+            "params[endMonth]": end_month,
+        }
+        return await self._async_get_json(self._bills_url, params, timing, cache)
+
+    async def async_get_house(
+        self, house_id: str, timing: RequestTiming | None = None
+    ) -> dict[str, Any] | None:
+        """Fetch the house info (balance, customer name, address)."""
+        return await self._async_get_json(
+            self._house_url.format(house_id=house_id), None, timing
+        )
+
+    async def _async_get_json(
+        self,
+        url: str,
+        params: dict[str, str] | None = None,
+        timing: RequestTiming | None = None,
+        cache: bool = True,
+    ) -> dict[str, Any] | None:
+        """Return the decoded body, from the cache or a (shared) request."""
+        key = (url, tuple(sorted(params.items())) if params else ())
+        entry = self.cache.get(key) if cache else None
+        if entry is not None and time.monotonic() - entry.fetched < self._cache_ttl:
+            if timing is not None:
+                timing.cache = "hit"
+            return entry.data
+
+        if (task := self._inflight.get(key)) is None:
+            task = self._inflight[key] = asyncio.create_task(
+                self._async_fetch(url, params, key if cache else None, entry, timing)
+            )
+            task.add_done_callback(partial(self._request_done, key))
+        elif timing is not None:
+            timing.cache = "shared"
+        return await asyncio.shield(task)
+
+    def _request_done(self, key: tuple, task: asyncio.Task) -> None:
+        """Forget a finished shared request."""
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Retrieve the exception even if every caller was cancelled
+            task.exception()
+
+    async def _async_fetch(
+        self,
+        url: str,
+        params: dict[str, str] | None,
+        key: tuple | None,
+        entry: _CachedResponse | None,
+        timing: RequestTiming | None,
+    ) -> dict[str, Any] | None:
+        """Issue a GET request through the host's circuit breaker."""
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Requests to {URL(url).host} are paused")
+
+        # Every outcome must reach the breaker, or a half-open trial that
+        # ended otherwise would keep the circuit half open for good
+        try:
+            result = await self._async_fetch_with_retries(
+                url, params, key, entry, timing
+            )
+        except asyncio.CancelledError:
+            breaker.release_trial()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+
+    async def _async_fetch_with_retries(
+        self,
+        url: str,
+        params: dict[str, str] | None,
+        key: tuple | None,
+        entry: _CachedResponse | None,
+        timing: RequestTiming | None,
+    ) -> dict[str, Any] | None:
+        """Issue a GET request with retries and decode the JSON body."""
+        last_error: Exception | None = None
+        for attempt in range(self._retry_attempts):
+            if attempt:
+                delay = min(API_RETRY_MAX_DELAY, API_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            try:
+                result = await self._async_request(
+                    url, params, key, entry, timing
+                )
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                _RetryableStatusError,
+            ) as err:
+                last_error = err
+                _LOGGER.debug(
+                    "GET %s failed (attempt %s/%s): %r",
+                    url,
+                    attempt + 1,
+                    self._retry_attempts,
+                    err,
+                )
+                continue
+            return result
+
+        raise SQZLSWaterApiError(
+            f"GET {url} failed after {self._retry_attempts} attempts: {last_error!r}"
+        ) from last_error
+
+    async def _async_request(
+        self,
+        url: str,
+        params: dict[str, str] | None,
+        key: tuple | None,
+        entry: _CachedResponse | None,
+        timing: RequestTiming | None,
+    ) -> dict[str, Any] | None:
+        """Send one (conditional) GET request; a None key is not cached."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire()
+        start = time.monotonic()
+        async with self.session.get(
+            url, params=params, headers=headers, trace_request_ctx=timing
+        ) as response:
+            if response.status == 429 or response.status >= 500:
+                raise _RetryableStatusError(f"HTTP {response.status}")
+            if response.status == 304 and entry is not None:
+                if self.capture is not None:
+                    # Captures stay self-contained: store what was revalidated
+                    self.capture.record(
+                        url, params, 200, entry.data, time.monotonic() - start
+                    )
+                return self._reuse(key, entry, "not_modified", timing)
+            if response.status != 200:
+                _LOGGER.debug("GET %s returned HTTP %s", url, response.status)
+                if self.capture is not None:
+                    self.capture.record(
+                        url, params, response.status, None, time.monotonic() - start
+                    )
+                return None
+            body = await response.read()
+        elapsed = time.monotonic() - start
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if entry is not None and entry.digest == digest:
+            # 内容未变化：不再解析，返回同一个对象
+            if self.capture is not None:
+                self.capture.record(url, params, 200, entry.data, elapsed)
+            return self._reuse(key, entry, "unchanged", timing)
+
+        decode_start = time.perf_counter()
+        try:
+            if len(body) >= JSON_EXECUTOR_MIN_BYTES:
+                # 大响应在线程池中解码，不阻塞事件循环
+                data = await asyncio.get_running_loop().run_in_executor(
+                    None, json_loads, body
+                )
+            else:
+                data = json_loads(body)
+        except ValueError as err:
+            if self.capture is not None:
+                # 非 JSON 内容可能包含任何信息，只记录状态码
+                self.capture.record(url, params, 200, None, elapsed)
+            # 维护页面等非 JSON 响应：和 5xx 一样重试并计入熔断器
+            raise _RetryableStatusError(f"Invalid JSON body: {err}") from err
+        if timing is not None:
+            timing.decode = time.perf_counter() - decode_start
+        if self.capture is not None:
+            # 记录已解码的内容，不在事件循环中再次解析
+            self.capture.record(url, params, 200, data, elapsed)
+        code = data.get("code") if isinstance(data, dict) else None
+        if isinstance(code, int) and code >= 500:
+            # 接口在 HTTP 200 中返回的服务端错误：同样重试，用尽后计入熔断器
+            raise _RetryableStatusError(f"API code {code}: {data.get('msg')}")
+        if code == 200 and key is not None:
+            self.cache.put(
+                key,
+                _CachedResponse(
+                    data,
+                    digest,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                ),
+            )
+        return data
+
+    def _reuse(
+        self,
+        key: tuple,
+        entry: _CachedResponse,
+        outcome: str,
+        timing: RequestTiming | None,
+    ) -> dict[str, Any]:
+        """Mark a revalidated entry as fresh and return its data."""
+        entry.fetched = time.monotonic()
+        self.cache.put(key, entry)
+        if timing is not None:
+            timing.cache = outcome
+        return entry.data
@@ -0,0 +1,263 @@
+"""Record sqzls.com traffic without personal data, and replay it offline.
+
+A capture holds the response bodies of both endpoints as they reached the
+client. Identifying values are replaced while recording, so a capture can be
+attached to an issue. ReplaySession answers the client's requests from a
+capture instead of the network, which drives the coordinator with real
+payloads in benchmarks, profiling runs and reproducible bug reports.
+
+File format (gzip, one JSON document per line): a header
+{"format", "version", "created", "exchanges", "dropped"} followed by one
+line per exchange {"t", "endpoint", "house", "query", "status", "ms", "body"}.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+import datetime
+import gzip
+import hashlib
+import os
+import pathlib
+import time
+from typing import Any
+
+from yarl import URL
+
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util.json import json_loads
+
+from .const import CAPTURE_FORMAT_VERSION, CAPTURE_MAX_EXCHANGES, DOMAIN
+
+CAPTURE_FORMAT = f"{DOMAIN}_capture"
+
+BILLS = "bills"
+HOUSE = "house"
+
+# Keys whose values identify a person, a house or a meter
+PERSONAL_KEYS = frozenset(
+    {
+        "houseId",
+        "id",
+        "name",
+        "customerName",
+        "customerId",
+        "userName",
+        "address",
+        "houseAddress",
+        "phone",
+        "mobile",
+        "idCard",
+        "idNo",
+        "meterId",
+        "meterNo",
+    }
+)
+
+
+def _exchange_key(params: dict[str, str] | None, url: str) -> tuple[str, str, Any]:
+    """Return (endpoint, house_id, query) of a client request."""
+    if params and "houseId" in params:
+        query = [params.get("params[beginMonth]"), params.get("params[endMonth]")]
+        return BILLS, params["houseId"], query
+    return HOUSE, URL(url).name, None
+
+
+class TrafficCapture:
+    """Responses of both endpoints, anonymised while they are recorded.
+
+    Identifying values become keyed hashes. The key is random and never
+    written, so a house id maps to the same pseudonym everywhere in one
+    capture (request, rows and house info stay consistent) but cannot be
+    recovered from the file.
+    """
+
+    def __init__(
+        self,
+        house_ids: Iterable[str] | None = None,
+        max_exchanges: int = CAPTURE_MAX_EXCHANGES,
+    ) -> None:
+        """Start an empty capture, optionally limited to some houses."""
+        self._key = os.urandom(16)
+        self._house_ids = set(house_ids) if house_ids else None
+        self._max_exchanges = max_exchanges
+        self._started = time.monotonic()
+        self.created = datetime.datetime.now(datetime.timezone.utc).isoformat(
+            timespec="seconds"
+        )
+        self.exchanges: list[dict[str, Any]] = []
+        self.dropped = 0
+
+    def pseudonym(self, value: Any) -> str:
+        """Return the stable replacement of an identifying value."""
+        digest = hashlib.blake2b(
+            str(value).encode(), key=self._key, digest_size=6
+        ).hexdigest()
+        return f"anon-{digest}"
+
+    def anonymize(self, value: Any) -> Any:
+        """Return a copy of a decoded body with PERSONAL_KEYS replaced."""
+        if isinstance(value, dict):
+            return {
+                key: self.pseudonym(item)
+                if key in PERSONAL_KEYS and item not in (None, "")
+                else self.anonymize(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        return value
+
+    def record(
+        self,
+        url: str,
+        params: dict[str, str] | None,
+        status: int,
+        body: Any,
+        elapsed: float,
+    ) -> None:
+        """Add one response as the client received it.
+
+        body is the decoded JSON the client already has (None for a body that
+        was empty or not JSON), so recording never parses a body again.
+        """
+        endpoint, house_id, query = _exchange_key(params, url)
+        if self._house_ids is not None and house_id not in self._house_ids:
+            return
+        if len(self.exchanges) >= self._max_exchanges:
+            self.dropped += 1
+            return
+        data = self.anonymize(body) if body is not None else None
+        self.exchanges.append(
+            {
+                "t": round(time.monotonic() - self._started, 3),
+                "endpoint": endpoint,
+                "house": self.pseudonym(house_id),
+                "query": query,
+                "status": status,
+                "ms": round(elapsed * 1000, 1),
+                "body": data,
+            }
+        )
+
+    def save(self, path: pathlib.Path) -> int:
+        """Write the capture (blocking); return the file size."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {
+            "format": CAPTURE_FORMAT,
+            "version": CAPTURE_FORMAT_VERSION,
+            "created": self.created,
+            "exchanges": len(self.exchanges),
+            "dropped": self.dropped,
+        }
+        with gzip.open(path, "wb") as file:
+            file.write(json_bytes(header) + b"\n")
+            for exchange in self.exchanges:
+                file.write(json_bytes(exchange) + b"\n")
+        return path.stat().st_size
+
+
+def load_capture(path: pathlib.Path) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Read a capture file (blocking); return its header and exchanges."""
+    with gzip.open(path, "rb") as file:
+        header = json_loads(file.readline())
+        if (
+            not isinstance(header, dict)
+            or header.get("format") != CAPTURE_FORMAT
+            or header.get("version") != CAPTURE_FORMAT_VERSION
+        ):
+            raise ValueError(
+                f"{path} is not a version {CAPTURE_FORMAT_VERSION} capture"
+            )
+        return header, [json_loads(line) for line in file if line.strip()]
+
+
+class _ReplayResponse:
+    """The parts of aiohttp.ClientResponse the client uses."""
+
+    def __init__(self, status: int, body: bytes) -> None:
+        """Initialize the response."""
+        self.status = status
+        self.headers: dict[str, str] = {}
+        self._body = body
+
+    async def read(self) -> bytes:
+        """Return the body."""
+        return self._body
+
+
+class _ReplayRequest:
+    """Async context manager returned by ReplaySession.get()."""
+
+    def __init__(self, response: _ReplayResponse, delay: float) -> None:
+        """Initialize the request."""
+        self._response = response
+        self._delay = delay
+
+    async def __aenter__(self) -> _ReplayResponse:
+        """Wait the recorded latency, if any, and answer."""
+        if self._delay > 0:
+            await asyncio.sleep(self._delay)
+        return self._response
+
+    async def __aexit__(self, *exc) -> None:
+        """Nothing to release."""
+
+
+class ReplaySession:
+    """Stand-in for aiohttp.ClientSession answering from a capture.
+
+    Pass it to SQZLSWaterApiClient as the session. Requests are matched on
+    endpoint, house and bills window; the responses recorded for a match are
+    returned in order and the last one repeats. A bills window that was not
+    recorded (replayed on another date) falls back to the responses of any
+    window of that house. With latency=True the recorded latency is waited.
+    """
+
+    closed = False
+
+    def __init__(
+        self, exchanges: Iterable[dict[str, Any]], *, latency: bool = False
+    ) -> None:
+        """Index the exchanges."""
+        self._responses: dict[tuple, list[tuple[int, bytes, float]]] = {}
+        self._positions: dict[tuple, int] = {}
+        self._latency = latency
+        self.requests = 0
+        for exchange in exchanges:
+            body = exchange["body"]
+            response = (
+                exchange["status"],
+                b"" if body is None else json_bytes(body),
+                exchange["ms"] / 1000,
+            )
+            endpoint, house = exchange["endpoint"], exchange["house"]
+            query = tuple(exchange["query"] or ())
+            self._responses.setdefault((endpoint, house, query), []).append(response)
+            self._responses.setdefault((endpoint, house), []).append(response)
+
+    @property
+    def houses(self) -> list[str]:
+        """Return the (pseudonymous) house ids in the capture."""
+        return sorted({key[1] for key in self._responses if len(key) == 2})
+
+    def get(
+        self, url: str, params: dict[str, str] | None = None, **kwargs: Any
+    ) -> _ReplayRequest:
+        """Answer a GET request with the next recorded response."""
+        self.requests += 1
+        endpoint, house_id, query = _exchange_key(params, url)
+        key = (endpoint, house_id, tuple(query or ()))
+        if key not in self._responses:
+            key = (endpoint, house_id)
+        if (responses := self._responses.get(key)) is None:
+            return _ReplayRequest(_ReplayResponse(404, b""), 0)
+        position = self._positions.get(key, 0)
+        self._positions[key] = min(position + 1, len(responses) - 1)
+        status, body, delay = responses[position]
+        return _ReplayRequest(
+            _ReplayResponse(status, body), delay if self._latency else 0
+        )
+
+    async def close(self) -> None:
+        """Nothing to close."""
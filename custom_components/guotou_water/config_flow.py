@@ -5,21 +5,30 @@ import logging
 import datetime
 from typing import Any
 
-import aiohttp
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry, OptionsFlow
 from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import selector
 
+from .api import async_get_client
 from .const import (
     DOMAIN,
+    CONF_ADAPTIVE_POLLING,
+    CONF_FLEET,
+    CONF_HISTORY_FORMAT,
     CONF_HOUSE_ID,
+    CONF_METER_ENTITY,
     CONF_UPDATE_INTERVAL,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_HISTORY_FORMAT,
     DEFAULT_UPDATE_INTERVAL,
-    API_BASE_URL,
+    FLEET,
+    HISTORY_FORMATS,
 )
+from .store import async_cache_validation, initial_sync_window
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -32,7 +41,17 @@ class SQZLSWaterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle the initial step."""
+        """Choose between adding a house and the fleet rollup device."""
+        if any(
+            entry.data.get(CONF_FLEET) for entry in self._async_current_entries()
+        ):
+            return await self.async_step_house(user_input)
+        return self.async_show_menu(step_id="user", menu_options=["house", FLEET])
+
+    async def async_step_house(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle adding a house."""
         errors = {}
 
         if user_input is not None:
@@ -54,7 +73,7 @@ class SQZLSWaterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors["base"] = "cannot_connect"
 
         return self.async_show_form(
-            step_id="user",
+            step_id="house",
             data_schema=vol.Schema(
                 {
                     vol.Required(CONF_HOUSE_ID): str,
@@ -64,33 +83,38 @@ class SQZLSWaterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
     async def _test_credentials(self, house_id: str) -> bool:
-        """Test if the credentials are valid."""
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Accept": "application/json",
-        }
-
-        now = datetime.datetime.now()
-        begin_month = f"{now.year}-01-01"
-        end_month = f"{now.year}-12-31"
-
-        params = {
-            "houseId": house_id,
-            "params[beginMonth]": begin_month,
-            "params[endMonth]": end_month,
-        }
+        """Test if the credentials are valid.
 
+        The same window as the first sync is requested, so a valid response
+        is cached and the first refresh does not download it again.
+        """
+        window = initial_sync_window(datetime.datetime.now())
+
+        client = async_get_client(self.hass)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(API_BASE_URL, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        json_data = await response.json()
-                        return json_data.get("code") == 200
+            json_data = await client.async_get_bills(house_id, *window)
+            if json_data and json_data.get("code") == 200:
+                async_cache_validation(self.hass, house_id, window, json_data)
+                return True
         except Exception as e:
             _LOGGER.error("Error testing credentials: %s", e)
 
         return False
 
+    async def async_step_fleet(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Add the device with the totals over all houses."""
+        await self.async_set_unique_id(FLEET)
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(title="国投水务汇总", data={CONF_FLEET: True})
+
+    @classmethod
+    @callback
+    def async_supports_options_flow(cls, config_entry: ConfigEntry) -> bool:
+        """Only houses have options."""
+        return not config_entry.data.get(CONF_FLEET)
+
     @staticmethod
     @callback
     def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
@@ -118,6 +142,31 @@ class SQZLSWaterOptionsFlowHandler(OptionsFlow):
                             CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL
                         ),
                     ): vol.All(vol.Coerce(int), vol.Range(min=300, max=86400)),
+                    vol.Optional(
+                        CONF_ADAPTIVE_POLLING,
+                        default=self.config_entry.options.get(
+                            CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        CONF_HISTORY_FORMAT,
+                        default=self.config_entry.options.get(
+                            CONF_HISTORY_FORMAT, DEFAULT_HISTORY_FORMAT
+                        ),
+                    ): vol.In(HISTORY_FORMATS),
+                    # 可留空；读数须与自来水公司水表的读数一致
+                    vol.Optional(
+                        CONF_METER_ENTITY,
+                        description={
+                            "suggested_value": self.config_entry.options.get(
+                                CONF_METER_ENTITY
+                            )
+                        },
+                    ): selector.EntitySelector(
+                        selector.EntitySelectorConfig(
+                            domain="sensor", device_class="water"
+                        )
+                    ),
                 }
             ),
         )
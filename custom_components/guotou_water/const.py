@@ -5,17 +5,126 @@ DOMAIN = "guotou_water"
 # Configuration keys
 CONF_HOUSE_ID = "house_id"
 CONF_UPDATE_INTERVAL = "update_interval"
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_HISTORY_FORMAT = "history_format"
+CONF_FLEET = "fleet"  # entry of the fleet rollup device instead of a house
+CONF_METER_ENTITY = "meter_entity"  # local sensor reporting the same meter index
+
+# History attribute encodings
+HISTORY_FORMAT_ROWS = "rows"
+HISTORY_FORMAT_COLUMNAR = "columnar"
+HISTORY_FORMAT_SUMMARY = "summary"  # history served by the websocket API only
+HISTORY_FORMATS = [HISTORY_FORMAT_SUMMARY, HISTORY_FORMAT_ROWS, HISTORY_FORMAT_COLUMNAR]
 
 # Default values - 2 hours
 DEFAULT_UPDATE_INTERVAL = 7200  # 2 hours in seconds
+DEFAULT_ADAPTIVE_POLLING = False
+DEFAULT_HISTORY_FORMAT = HISTORY_FORMAT_SUMMARY
+
+# Websocket history API
+WS_HISTORY_DEFAULT_LIMIT = 24
+WS_HISTORY_MAX_LIMIT = 600
+HISTORY_RANGE_CACHE_SIZE = 32
+# Serialized view models kept per version, one per requested calendar year
+VIEW_MODEL_CACHE_SIZE = 8
+
+# Adaptive polling
+ADAPTIVE_MAX_INTERVAL = 86400  # back off to at most one poll a day
+ADAPTIVE_EVENT_WINDOW_DAYS = 1  # poll at the base rate +/- this many days around a learned change
+ADAPTIVE_MAX_EVENTS = 24  # learned change days kept per house
+ADAPTIVE_UNPAID_FACTOR = 4  # max multiple of the base interval while a bill is unpaid
 
 # API
 API_BASE_URL = "http://sqzls.com/api/market/bill/listByMonth"
 API_HOUSE_URL = "http://sqzls.com/api/market/house/{house_id}"
+API_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "application/json",
+}
+API_TIMEOUT = 20  # seconds per request attempt
+API_RETRY_ATTEMPTS = 3
+API_RETRY_BASE_DELAY = 2  # seconds, doubled on every retry
+API_RETRY_MAX_DELAY = 10  # seconds
+REFRESH_TIMEOUT = 90  # seconds for a whole refresh, retries included
+
+# Response cache: answers younger than the TTL are served without a request,
+# older ones are revalidated (ETag / Last-Modified, else a body digest)
+API_CACHE_TTL = 60  # seconds
+# Sized per polled house (its bill window and house info); backfill windows
+# are never cached
+API_CACHE_ENTRIES_PER_HOUSE = 4  # (endpoint, params) entries
+
+# Responses and histories at least this large are decoded/aggregated in the
+# executor instead of on the event loop
+JSON_EXECUTOR_MIN_BYTES = 128 * 1024
+PARSE_EXECUTOR_MIN_ROWS = 300
+
+# Circuit breaker per API host
+CIRCUIT_FAILURE_THRESHOLD = 3  # failed requests (after retries) in a row
+CIRCUIT_RESET_TIMEOUT = 600  # seconds before a trial request is let through
+
+# Shared HTTP connection pool
+CONNECTOR_LIMIT = 20
+CONNECTOR_LIMIT_PER_HOST = 4
+CONNECTOR_DNS_CACHE_TTL = 600  # seconds
+CONNECTOR_KEEPALIVE_TIMEOUT = 60  # seconds
+
+# Global politeness limits shared by all houses
+RATE_LIMIT_PER_SECOND = 2.0
+RATE_LIMIT_BURST = 4
+SCHEDULER_MAX_CONCURRENT = 3
+SCHEDULER_JITTER = 0.1  # +/- fraction of the update interval
+SCHEDULER_BATCH_DELAY = 5  # seconds to collect setup-time refreshes
+
+# Rolling window of refresh metrics kept per house
+METRICS_WINDOW = 100
+
+# History backfill service
+SERVICE_BACKFILL_HISTORY = "backfill_history"
+EVENT_BACKFILL_PROGRESS = f"{DOMAIN}_backfill_progress"
+BACKFILL_MAX_CONCURRENT = 4
+BACKFILL_MIN_YEAR = 2000
+
+# Traffic capture services (anonymised request/response pairs for replay)
+SERVICE_START_CAPTURE = "start_capture"
+SERVICE_STOP_CAPTURE = "stop_capture"
+CAPTURE_DIR = f"{DOMAIN}_captures"  # under the config directory
+CAPTURE_FORMAT_VERSION = 1
+CAPTURE_MAX_EXCHANGES = 5000
+
+# Usage analytics: an anomaly score needs this many other samples, and the
+# deviation is floored at a fraction of the baseline (and at ANOMALY_MIN_STD m³)
+ANOMALY_MIN_SAMPLES = 2
+ANOMALY_STD_FLOOR = 0.1
+ANOMALY_MIN_STD = 0.5
+
+# Local tariff: tiers are fitted to the last TARIFF_WINDOW_MONTHS billed months;
+# a tiered model must beat the flat one by TARIFF_FIT_MARGIN (share of billed
+# amount) to be used
+TARIFF_WINDOW_MONTHS = 12
+TARIFF_FIT_MARGIN = 0.01
+TARIFF_PERIOD_YEAR = "year"  # 阶梯按年累计用水量
+TARIFF_PERIOD_MONTH = "month"  # 阶梯按当月用水量
+
+# Persistent storage
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10  # seconds
+
+# Config flow validation responses are reused by the first refresh for this long
+VALIDATION_CACHE_TTL = 300  # seconds
 
 # Coordinator key
 COORDINATOR = "coordinator"
 UNDO_UPDATE_LISTENER = "undo_update_listener"
+UNDO_SCHEDULER = "undo_scheduler"
+SESSION = "session"
+CLIENT = "client"
+SCHEDULER = "scheduler"
+VALIDATION_CACHE = "validation_cache"
+FLEET = "fleet"
+CAPTURE = "capture"
+UNDO_FLEET = "undo_fleet"
+UNDO_CLIENT = "undo_client"
 
 # Sensor types (normal sensors with limited attributes for recorder)
 SENSOR_TYPES = {
@@ -78,3 +187,104 @@ HISTORY_SENSOR_TYPE = {
         "device_class": None,
     },
 }
+
+# Sensors computed locally from monthly_history
+ANALYTICS_SENSOR_TYPES = {
+    "forecast_yearly_volume": {
+        "name": "预计全年用水量",
+        "icon": "mdi:chart-timeline-variant",
+        "unit_of_measurement": "m³",
+        "device_class": "water",
+    },
+    "forecast_yearly_amount": {
+        "name": "预计全年水费",
+        "icon": "mdi:chart-timeline-variant",
+        "unit_of_measurement": "元",
+        "device_class": "monetary",
+    },
+    "monthly_baseline": {
+        "name": "本月基准用水量",
+        "icon": "mdi:water-check",
+        "unit_of_measurement": "m³",
+        "device_class": "water",
+    },
+    "usage_anomaly_score": {
+        "name": "用水异常指数",
+        "icon": "mdi:water-alert",
+        "unit_of_measurement": None,
+        "device_class": None,
+    },
+}
+
+# Bill estimates from the local tariff, updated by the meter entity if any
+TARIFF_SENSOR_TYPES = {
+    "estimated_amount": {
+        "name": "本月估算水费",
+        "icon": "mdi:calculator-variant",
+        "unit_of_measurement": "元",
+        "device_class": "monetary",
+    },
+    "projected_amount": {
+        "name": "本月预计水费",
+        "icon": "mdi:chart-timeline-variant",
+        "unit_of_measurement": "元",
+        "device_class": "monetary",
+    },
+}
+
+# Diagnostic sensors (disabled by default, fed by the refresh metrics)
+DIAGNOSTIC_SENSOR_TYPES = {
+    "refresh_duration": {
+        "name": "刷新耗时",
+        "icon": "mdi:timer-outline",
+        "unit_of_measurement": "ms",
+    },
+    "bills_latency": {
+        "name": "账单接口耗时",
+        "icon": "mdi:timer-outline",
+        "unit_of_measurement": "ms",
+    },
+    "house_latency": {
+        "name": "余额接口耗时",
+        "icon": "mdi:timer-outline",
+        "unit_of_measurement": "ms",
+    },
+    "bills_response_size": {
+        "name": "账单响应大小",
+        "icon": "mdi:file-download-outline",
+        "unit_of_measurement": "B",
+    },
+    "api_failures": {
+        "name": "接口失败次数",
+        "icon": "mdi:alert-circle-outline",
+        "unit_of_measurement": None,
+    },
+}
+
+# Fleet rollup sensors over every loaded house (optional fleet entry)
+FLEET_SENSOR_TYPES = {
+    "yearly_volume": {
+        "name": "全部户本年用水量",
+        "icon": "mdi:water",
+        "unit_of_measurement": "m³",
+        "device_class": "water",
+    },
+    "unpaid_amount": {
+        "name": "全部户未缴金额",
+        "icon": "mdi:currency-cny",
+        "unit_of_measurement": "元",
+        "device_class": "monetary",
+    },
+    "lowest_balance": {
+        "name": "最低账户余额",
+        "icon": "mdi:wallet-outline",
+        "unit_of_measurement": "元",
+        "device_class": "monetary",
+    },
+    "houses_in_arrears": {
+        "name": "欠费户数",
+        "icon": "mdi:home-alert",
+        "unit_of_measurement": None,
+        "device_class": None,
+    },
+}
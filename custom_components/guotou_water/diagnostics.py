@@ -0,0 +1,55 @@
+"""Diagnostics support for SQZLS Water."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_FLEET, CONF_HOUSE_ID, COORDINATOR, DOMAIN
+from .fleet import async_get_fleet
+
+TO_REDACT = {CONF_HOUSE_ID, "house_id", "customer_name", "address", "meter_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    if entry.data.get(CONF_FLEET):
+        return {
+            "entry": {"data": dict(entry.data)},
+            "fleet": async_get_fleet(hass).as_dict(),
+        }
+
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    data = dict(coordinator.data or {})
+    data.pop("monthly_history", None)
+    history = coordinator.history
+    tariff = coordinator.billing.tariff
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "stale": coordinator.stale,
+            "last_fetch": coordinator.last_fetch,
+            "poll_interval": coordinator.poll_interval.total_seconds(),
+            "next_refresh_interval": coordinator.next_refresh_interval(),
+            "history_format": coordinator.history_format,
+            "history_version": coordinator.history_version,
+            "history_months": len(history),
+            "history_range": [history.first_month, history.last_month],
+            "stored_months": len(coordinator.store.bills),
+            "changed_keys": sorted(coordinator.changed_keys),
+            "meter_entity": coordinator.meter_entity,
+            "tariff": tariff.as_dict() if tariff is not None else None,
+        },
+        "data": async_redact_data(data, TO_REDACT),
+        "metrics": coordinator.metrics.as_dict(),
+        "circuit_breakers": coordinator.client.breaker_states(),
+    }
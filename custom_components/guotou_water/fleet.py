@@ -0,0 +1,180 @@
+"""Rollup of every loaded SQZLS Water house, maintained incrementally."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import heapq
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import DOMAIN, FLEET
+
+if TYPE_CHECKING:
+    from . import SQZLSWaterDataUpdateCoordinator
+
+# Payload keys the rollup is computed from
+FLEET_KEYS = frozenset({"yearly_volume", "unpaid_amount", "balance"})
+
+
+@callback
+def async_get_fleet(hass: HomeAssistant) -> FleetRollup:
+    """Return the rollup shared by every entry."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (fleet := domain_data.get(FLEET)) is None:
+        fleet = domain_data[FLEET] = FleetRollup()
+    return fleet
+
+
+def _number(value: Any) -> float | None:
+    """Return a payload value as float, None when it was never received."""
+    return None if value is None else float(value)
+
+
+class FleetRollup:
+    """Totals over all houses, adjusted by the change of one house at a time.
+
+    Every coordinator reports its own values after an update that touched
+    FLEET_KEYS. The sums are corrected by the difference to what the house
+    reported before, the houses in arrears are kept in a set and the lowest
+    balance is the top of a heap whose outdated entries are dropped when
+    they surface, so one update costs O(log n) however many houses there are.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty rollup."""
+        # house_id -> (yearly volume, unpaid amount, balance)
+        self._values: dict[str, tuple[float | None, ...]] = {}
+        self.yearly_volume = 0.0
+        self.unpaid_amount = 0.0
+        self.arrears: set[str] = set()
+        # (balance, house_id); entries no longer matching _values are outdated
+        self._balances: list[tuple[float, str]] = []
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def houses(self) -> int:
+        """Return the number of houses with data."""
+        return len(self._values)
+
+    @callback
+    def async_track(
+        self, coordinator: SQZLSWaterDataUpdateCoordinator
+    ) -> CALLBACK_TYPE:
+        """Follow a house's coordinator; return a callback that stops it."""
+        house_id = coordinator.house_id
+
+        @callback
+        def _async_coordinator_updated() -> None:
+            if coordinator.data is None:
+                return
+            if house_id in self._values and coordinator.changed_keys.isdisjoint(
+                FLEET_KEYS
+            ):
+                return
+            self.async_set_house(house_id, coordinator.data)
+
+        unsub = coordinator.async_add_listener(_async_coordinator_updated)
+        if coordinator.data is not None:
+            self.async_set_house(house_id, coordinator.data)
+
+        @callback
+        def _async_untrack() -> None:
+            unsub()
+            self.async_remove_house(house_id)
+
+        return _async_untrack
+
+    @callback
+    def async_set_house(self, house_id: str, data: dict[str, Any]) -> None:
+        """Replace the values of one house."""
+        values = tuple(
+            _number(data.get(key))
+            for key in ("yearly_volume", "unpaid_amount", "balance")
+        )
+        previous = self._values.get(house_id)
+        if previous == values:
+            return
+        if previous is not None:
+            self._apply(house_id, previous, -1)
+        self._values[house_id] = values
+        self._apply(house_id, values, 1)
+        self.async_notify()
+
+    @callback
+    def async_remove_house(self, house_id: str) -> None:
+        """Forget a house (entry unloaded)."""
+        if (previous := self._values.pop(house_id, None)) is None:
+            return
+        self._apply(house_id, previous, -1)
+        if not self._values:
+            # Start again from exact zeros instead of accumulated rounding
+            self.yearly_volume = self.unpaid_amount = 0.0
+            self._balances.clear()
+        self.async_notify()
+
+    def _apply(
+        self, house_id: str, values: tuple[float | None, ...], sign: int
+    ) -> None:
+        """Add (sign=1) or remove (sign=-1) one house's values."""
+        volume, unpaid, balance = values
+        self.yearly_volume += sign * (volume or 0.0)
+        self.unpaid_amount += sign * (unpaid or 0.0)
+        if sign < 0:
+            self.arrears.discard(house_id)
+            return
+        # 有未缴账单或余额为负都算欠费
+        if (unpaid or 0.0) > 0 or (balance is not None and balance < 0):
+            self.arrears.add(house_id)
+        if balance is not None:
+            heapq.heappush(self._balances, (balance, house_id))
+            if len(self._balances) > 2 * len(self._values) + 16:
+                self._compact()
+
+    def _compact(self) -> None:
+        """Rebuild the heap without outdated entries."""
+        self._balances = [
+            (values[2], house_id)
+            for house_id, values in self._values.items()
+            if values[2] is not None
+        ]
+        heapq.heapify(self._balances)
+
+    def lowest_balance(self) -> tuple[float, str] | None:
+        """Return (balance, house_id) of the house with the lowest balance."""
+        heap = self._balances
+        while heap:
+            balance, house_id = heap[0]
+            values = self._values.get(house_id)
+            if values is not None and values[2] == balance:
+                return balance, house_id
+            heapq.heappop(heap)
+        return None
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call update_callback whenever a total changed."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove() -> None:
+            self._listeners.remove(update_callback)
+
+        return _remove
+
+    @callback
+    def async_notify(self) -> None:
+        """Tell the fleet sensors that a house changed."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the rollup for diagnostics."""
+        lowest = self.lowest_balance()
+        return {
+            "houses": self.houses,
+            "yearly_volume": round(self.yearly_volume, 2),
+            "unpaid_amount": round(self.unpaid_amount, 2),
+            "lowest_balance": lowest[0] if lowest else None,
+            "houses_in_arrears": len(self.arrears),
+            "heap_entries": len(self._balances),
+        }
@@ -0,0 +1,97 @@
+"""Immutable, versioned monthly history shared by every consumer."""
+from __future__ import annotations
+
+import bisect
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+from homeassistant.helpers.json import json_bytes
+
+from .const import HISTORY_RANGE_CACHE_SIZE
+from .parser import history_to_columns
+
+
+class HistorySnapshot:
+    """One version of monthly_history, handed out by reference.
+
+    The coordinator publishes a new snapshot only when the history content
+    changes; the payload, the history sensor's attributes, diagnostics and
+    websocket pages all point at the same entries. Derived forms (columns,
+    ranges, serialized pages) are built on first use and kept for the
+    lifetime of the version, so their cost does not grow with the number of
+    readers. Neither the entries nor anything returned here may be modified.
+    """
+
+    __slots__ = ("house_id", "version", "entries", "_dates", "_columns", "_pages")
+
+    def __init__(
+        self, house_id: str, version: int, entries: Iterable[dict[str, Any]] = ()
+    ) -> None:
+        """Freeze the entries (sorted by date) as version `version`."""
+        self.house_id = house_id
+        self.version = version
+        self.entries: tuple[dict[str, Any], ...] = tuple(entries)
+        self._dates = [entry["date"] for entry in self.entries]
+        self._columns: dict[str, list[Any]] | None = None
+        # (start, end, offset, limit) -> websocket result payload
+        self._pages: OrderedDict[tuple[str, str, int, int], bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of months."""
+        return len(self.entries)
+
+    @property
+    def first_month(self) -> str | None:
+        """Return the date of the oldest entry."""
+        return self._dates[0] if self._dates else None
+
+    @property
+    def last_month(self) -> str | None:
+        """Return the date of the newest entry."""
+        return self._dates[-1] if self._dates else None
+
+    @property
+    def columns(self) -> dict[str, list[Any]]:
+        """Return the history as one list per field, built once."""
+        if self._columns is None:
+            self._columns = history_to_columns(self.entries)
+        return self._columns
+
+    def range(self, start: str | None, end: str | None) -> tuple[dict[str, Any], ...]:
+        """Return the entries with start <= month <= end (YYYY-MM)."""
+        dates = self._dates
+        lo = bisect.bisect_left(dates, start[:7]) if start else 0
+        # "YYYY-MM" + "\uffff" sorts after every date inside that month
+        hi = bisect.bisect_right(dates, end[:7] + "\uffff") if end else len(dates)
+        return self.entries[lo:hi]
+
+    def page_json(
+        self, start: str | None, end: str | None, offset: int, limit: int
+    ) -> bytes:
+        """Return one serialized page of a month range.
+
+        Pages are cached per request shape until the history changes, so
+        repeated requests from any number of clients are served without
+        slicing or encoding again.
+        """
+        key = (start or "", end or "", offset, limit)
+        if (cached := self._pages.get(key)) is not None:
+            self._pages.move_to_end(key)
+            return cached
+
+        entries = self.range(start, end)
+        payload = json_bytes(
+            {
+                "house_id": self.house_id,
+                "version": self.version,
+                "total": len(entries),
+                "offset": offset,
+                "limit": limit,
+                "history": entries[offset : offset + limit],
+            }
+        )
+        self._pages[key] = payload
+        if len(self._pages) > HISTORY_RANGE_CACHE_SIZE:
+            self._pages.popitem(last=False)
+        return payload
@@ -0,0 +1,215 @@
+"""Low-overhead hot-path metrics for SQZLS Water refreshes."""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .const import METRICS_WINDOW
+
+
+class RollingStats:
+    """Keep the last METRICS_WINDOW samples and report percentiles."""
+
+    __slots__ = ("_samples",)
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        """Initialize the window."""
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def add(self, value: float) -> None:
+        """Add a sample."""
+        self._samples.append(value)
+
+    @property
+    def last(self) -> float | None:
+        """Return the latest sample."""
+        return self._samples[-1] if self._samples else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary of the window."""
+        if not self._samples:
+            return {"count": 0}
+        ordered = sorted(self._samples)
+        size = len(ordered)
+        return {
+            "count": size,
+            "last": round(self._samples[-1], 3),
+            "p50": round(ordered[size // 2], 3),
+            "p95": round(ordered[min(size - 1, int(0.95 * size))], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+
+class RequestTiming(SimpleNamespace):
+    """Timestamps of one HTTP request, filled in by the trace hooks."""
+
+    def __init__(self) -> None:
+        """Start timing."""
+        super().__init__(
+            start=time.perf_counter(),
+            request_start=None,
+            connect_start=None,
+            connect=None,
+            ttfb=None,
+            size=0,
+            attempts=0,
+            cache=None,
+            decode=None,
+        )
+
+
+class EndpointMetrics:
+    """Timings, sizes and counters of one API endpoint."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.connect_ms = RollingStats()
+        self.ttfb_ms = RollingStats()
+        self.total_ms = RollingStats()
+        self.response_bytes = RollingStats()
+        self.decode_ms = RollingStats()
+        self.success = 0
+        self.failure = 0
+        self.retries = 0
+        self.last_error: str | None = None
+        # Response cache outcomes: hit, shared, not_modified, unchanged
+        self.cache: dict[str, int] = {}
+
+    def record(self, timing: RequestTiming, error: BaseException | None) -> None:
+        """Record a finished call (all retries included)."""
+        self.total_ms.add((time.perf_counter() - timing.start) * 1000)
+        if timing.connect is not None:
+            self.connect_ms.add(timing.connect * 1000)
+        if timing.ttfb is not None:
+            self.ttfb_ms.add(timing.ttfb * 1000)
+        self.retries += max(0, timing.attempts - 1)
+        if timing.decode is not None:
+            self.decode_ms.add(timing.decode * 1000)
+        if timing.cache is not None:
+            self.cache[timing.cache] = self.cache.get(timing.cache, 0) + 1
+        if error is None:
+            self.success += 1
+            if timing.cache is None:
+                # Cache outcomes read no (or no new) body; keep sizes of real reads
+                self.response_bytes.add(timing.size)
+        else:
+            self.failure += 1
+            self.last_error = repr(error)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "success": self.success,
+            "failure": self.failure,
+            "retries": self.retries,
+            "last_error": self.last_error,
+            "cache": dict(self.cache),
+            "connect_ms": self.connect_ms.as_dict(),
+            "ttfb_ms": self.ttfb_ms.as_dict(),
+            "total_ms": self.total_ms.as_dict(),
+            "response_bytes": self.response_bytes.as_dict(),
+            "decode_ms": self.decode_ms.as_dict(),
+        }
+
+
+class RefreshMetrics:
+    """All metrics of one house's coordinator."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.bills = EndpointMetrics()
+        self.house = EndpointMetrics()
+        self.refresh_ms = RollingStats()
+        self.parse_ms = RollingStats()
+        # Months aggregated per refresh: all on the first, then only merged ones
+        self.rows = RollingStats()
+        self.refresh_failures = 0
+        self._listeners: list[Callable[[], None]] = []
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call update_callback after every refresh."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove() -> None:
+            self._listeners.remove(update_callback)
+
+        return _remove
+
+    @callback
+    def async_notify(self) -> None:
+        """Tell the diagnostic sensors that a refresh finished."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for diagnostics."""
+        return {
+            "refresh_ms": self.refresh_ms.as_dict(),
+            "refresh_failures": self.refresh_failures,
+            "parse_ms": self.parse_ms.as_dict(),
+            "rows": self.rows.as_dict(),
+            "bills": self.bills.as_dict(),
+            "house": self.house.as_dict(),
+        }
+
+
+def _timing(trace_config_ctx: SimpleNamespace) -> RequestTiming | None:
+    """Return the RequestTiming passed as trace_request_ctx, if any."""
+    timing = trace_config_ctx.trace_request_ctx
+    return timing if isinstance(timing, RequestTiming) else None
+
+
+# The trace hooks only store timestamps; the cost per request is a few calls.
+async def _on_request_start(session, ctx, params) -> None:
+    if (timing := _timing(ctx)) is not None:
+        timing.attempts += 1
+        timing.request_start = time.perf_counter()
+        timing.connect = timing.ttfb = None
+        timing.size = 0
+
+
+async def _on_connection_create_start(session, ctx, params) -> None:
+    if (timing := _timing(ctx)) is not None:
+        timing.connect_start = time.perf_counter()
+
+
+async def _on_connection_create_end(session, ctx, params) -> None:
+    if (timing := _timing(ctx)) is not None:
+        timing.connect = time.perf_counter() - timing.connect_start
+
+
+async def _on_connection_reuseconn(session, ctx, params) -> None:
+    if (timing := _timing(ctx)) is not None:
+        timing.connect = 0.0
+
+
+async def _on_request_end(session, ctx, params) -> None:
+    # Fired once the response headers have arrived
+    if (timing := _timing(ctx)) is not None:
+        timing.ttfb = time.perf_counter() - timing.request_start
+
+
+async def _on_response_chunk_received(session, ctx, params) -> None:
+    if (timing := _timing(ctx)) is not None:
+        timing.size += len(params.chunk)
+
+
+def create_trace_config() -> aiohttp.TraceConfig:
+    """Return the trace config that fills RequestTiming objects."""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_response_chunk_received.append(_on_response_chunk_received)
+    return trace_config
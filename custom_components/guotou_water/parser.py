@@ -0,0 +1,206 @@
+"""Incremental aggregation of the stored listByMonth bill rows."""
+from __future__ import annotations
+
+import bisect
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+
+# "-MM-01" of every month, appended to a year to get the stored month keys
+_MONTH_SUFFIXES = tuple(f"-{month:02d}-01" for month in range(1, 13))
+
+
+class BillRecord:
+    """One month of a bill, converted once from the raw API row."""
+
+    __slots__ = (
+        "date",
+        "volume",
+        "amount",
+        "payable",
+        "paid",
+        "reading",
+        "last_reading",
+        "unit_price",
+        "is_paid",
+        "meter_id",
+        "cost_category",
+    )
+
+    def __init__(self, row: dict[str, Any]) -> None:
+        """Convert a raw listByMonth row."""
+        get = row.get
+        self.date: str = get("month") or ""
+        self.volume = float(get("quantity") or 0)
+        self.amount = float(get("amount") or 0)
+        self.payable = float(get("payableAmount") or 0)
+        self.paid = float(get("paidAmount") or 0)
+        self.reading = float(get("meterIndex") or 0)
+        self.last_reading = float(get("lastMeterIndex") or 0)
+        self.unit_price = float(get("unitPrice") or 0)
+        self.is_paid = get("isPaid", True)
+        self.meter_id = get("meterId")
+        self.cost_category = get("costCategoryName")
+
+
+class BillSummary:
+    """Everything the coordinator derives from the bill rows."""
+
+    __slots__ = (
+        "latest",
+        "yearly_volume",
+        "yearly_amount",
+        "unpaid_amount",
+        "monthly_volume",
+        "monthly_amount",
+        "history",
+    )
+
+    def __init__(self) -> None:
+        """Initialize an empty summary."""
+        self.latest: BillRecord | None = None
+        self.yearly_volume = 0.0
+        self.yearly_amount = 0.0
+        self.unpaid_amount = 0.0
+        # None until the current month has a bill row ("no data", not zero)
+        self.monthly_volume: float | None = None
+        self.monthly_amount: float | None = None
+        self.history: Sequence[dict[str, Any]] = []
+
+
+class BillAggregate:
+    """The BillSummary of a house's stored rows, maintained month by month.
+
+    Each month is converted once when it is merged. A refresh re-aggregates
+    only the months merged since the previous one, so its cost does not
+    grow with the stored (or backfilled) history. The year totals are summed
+    from the twelve months (YYYY-MM-01) of the requested year on demand,
+    which keeps them exact.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty aggregate."""
+        # month -> volume, amount and outstanding amount of its bill
+        self._months: dict[str, tuple[float, float, float]] = {}
+        self._unpaid: dict[str, float] = {}
+        # Newest month and its row, for the meter reading and meter info
+        self._latest = ""
+        self._latest_row: Mapping[str, Any] | None = None
+        # History entries of the months with usage, by date and sorted
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._dates: list[str] = []
+        # Rebuilt only when an entry changed, so unchanged refreshes share it
+        self.history: tuple[dict[str, Any], ...] = ()
+
+    def __len__(self) -> int:
+        """Return the number of aggregated months."""
+        return len(self._months)
+
+    def update(self, rows: Mapping[str, Mapping[str, Any]]) -> bool:
+        """Re-aggregate the given months (month -> row); True if history changed.
+
+        A first build (or a restore) goes through every stored month at
+        once, so the loop only converts rows; the newest month and the date
+        order are worked out once afterwards.
+        """
+        to_float = float
+        months, unpaid_months, entries = self._months, self._unpaid, self._entries
+        dates_changed = False
+        replaced: list[str] = []
+        for month, row in rows.items():
+            get = row.get
+            volume = to_float(get("quantity") or 0)
+            amount = to_float(get("amount") or 0)
+            is_paid = get("isPaid", True)
+            unpaid = 0.0
+            if not is_paid:
+                unpaid = to_float(get("payableAmount") or 0) - to_float(
+                    get("paidAmount") or 0
+                )
+            months[month] = (volume, amount, unpaid)
+            if unpaid:
+                unpaid_months[month] = unpaid
+            elif month in unpaid_months:
+                del unpaid_months[month]
+
+            # History entry of the month, only for months with usage
+            entry = None
+            if volume > 0:
+                entry = {
+                    "date": month,
+                    "volume": round(volume, 2),
+                    "amount": round(amount, 2),
+                    "reading": to_float(get("meterIndex") or 0),
+                    "last_reading": to_float(get("lastMeterIndex") or 0),
+                    "unit_price": to_float(get("unitPrice") or 0),
+                    "is_paid": is_paid,
+                }
+            previous = entries.get(month)
+            if entry == previous:
+                continue
+            if entry is None:
+                del entries[month]
+                dates_changed = True
+            else:
+                if previous is None:
+                    dates_changed = True
+                else:
+                    replaced.append(month)
+                entries[month] = entry
+
+        newest = max(rows, default="")
+        if newest and newest >= self._latest:
+            self._latest, self._latest_row = newest, rows[newest]
+        if dates_changed:
+            # Months are stored mostly in order, so this is close to linear
+            self._dates = sorted(entries)
+            self.history = tuple(map(entries.__getitem__, self._dates))
+        elif replaced:
+            # Same months: copy the references and swap only the changed ones
+            history = list(self.history)
+            for month in replaced:
+                history[bisect.bisect_left(self._dates, month)] = entries[month]
+            self.history = tuple(history)
+        return dates_changed or bool(replaced)
+
+    def summary(self, year: int, month: int) -> BillSummary:
+        """Return the latest record, totals and history for the given month."""
+        summary = BillSummary()
+        if self._latest_row is None:
+            return summary
+        summary.latest = BillRecord(self._latest_row)
+        yearly_volume = yearly_amount = 0.0
+        prefix = str(year)
+        for suffix in _MONTH_SUFFIXES:
+            if (totals := self._months.get(prefix + suffix)) is not None:
+                yearly_volume += totals[0]
+                yearly_amount += totals[1]
+        summary.yearly_volume = round(yearly_volume, 2)
+        summary.yearly_amount = round(yearly_amount, 2)
+        summary.unpaid_amount = round(sum(self._unpaid.values()), 2)
+        if (current := self._months.get(f"{year}-{month:02d}-01")) is not None:
+            summary.monthly_volume = round(current[0], 2)
+            summary.monthly_amount = round(current[1], 2)
+        summary.history = self.history
+        return summary
+
+
+# Field order of the columnar monthly_history encoding
+HISTORY_FIELDS = (
+    "date",
+    "volume",
+    "amount",
+    "reading",
+    "last_reading",
+    "unit_price",
+    "is_paid",
+)
+
+
+def history_to_columns(history: Sequence[dict[str, Any]]) -> dict[str, list[Any]]:
+    """Encode monthly_history as one list per field.
+
+    The "date" list is the shared index: position i of every other list
+    belongs to dates[i].
+    """
+    return {field: [entry[field] for entry in history] for field in HISTORY_FIELDS}
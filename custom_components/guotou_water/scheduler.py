@@ -0,0 +1,184 @@
+"""Shared polling scheduler for all SQZLS Water houses."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import logging
+import random
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    DOMAIN,
+    SCHEDULER,
+    SCHEDULER_BATCH_DELAY,
+    SCHEDULER_JITTER,
+    SCHEDULER_MAX_CONCURRENT,
+)
+
+if TYPE_CHECKING:
+    from . import SQZLSWaterDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@callback
+def async_get_scheduler(hass: HomeAssistant) -> SQZLSWaterScheduler:
+    """Return the scheduler shared by every entry."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (scheduler := domain_data.get(SCHEDULER)) is None:
+        scheduler = domain_data[SCHEDULER] = SQZLSWaterScheduler(hass)
+    return scheduler
+
+
+class SQZLSWaterScheduler:
+    """Spread refreshes of many houses over time.
+
+    Coordinators are registered without their own update interval. The
+    scheduler keeps one timer for the earliest due house, adds jitter to every
+    interval, caps the number of refreshes running at once and batches the
+    refreshes requested while entries are being set up.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._coordinators: dict[str, SQZLSWaterDataUpdateCoordinator] = {}
+        self._due: dict[str, float] = {}
+        self._batch: set[str] = set()
+        self._semaphore = asyncio.Semaphore(SCHEDULER_MAX_CONCURRENT)
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._unsub_batch: CALLBACK_TYPE | None = None
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the global refresh slots."""
+        async with self._semaphore:
+            yield
+
+    @callback
+    def async_register(
+        self, coordinator: SQZLSWaterDataUpdateCoordinator, refresh_now: bool
+    ) -> CALLBACK_TYPE:
+        """Start polling a coordinator; return a callback that stops it."""
+        house_id = coordinator.house_id
+        self._coordinators[house_id] = coordinator
+
+        if refresh_now:
+            self._batch.add(house_id)
+            if self._unsub_batch is None:
+                self._unsub_batch = async_call_later(
+                    self.hass, SCHEDULER_BATCH_DELAY, self._async_flush_batch
+                )
+        else:
+            # 首次轮询时间均匀分布在整个间隔内，避免重启后集中请求
+            interval = coordinator.next_refresh_interval()
+            self._due[house_id] = self._now() + random.uniform(0, interval)
+            self._async_arm_timer()
+
+        @callback
+        def _async_unregister() -> None:
+            self._async_unregister(house_id)
+
+        return _async_unregister
+
+    @callback
+    def async_reschedule(self, coordinator: SQZLSWaterDataUpdateCoordinator) -> None:
+        """Apply a changed interval to the next poll of a registered house.
+
+        A shorter interval moves the next poll forward; a longer one takes
+        effect after the poll that is already planned.
+        """
+        house_id = coordinator.house_id
+        if self._coordinators.get(house_id) is not coordinator:
+            return
+        if house_id in self._batch or house_id not in self._due:
+            # A refresh is pending or running and will plan the next one
+            return
+        due = self._now() + coordinator.next_refresh_interval()
+        if due < self._due[house_id]:
+            self._due[house_id] = due
+            self._async_arm_timer()
+
+    @callback
+    def _async_unregister(self, house_id: str) -> None:
+        """Stop polling a house."""
+        self._coordinators.pop(house_id, None)
+        self._due.pop(house_id, None)
+        self._batch.discard(house_id)
+        if not self._coordinators:
+            self._async_cancel_timers()
+        else:
+            self._async_arm_timer()
+
+    @callback
+    def _async_cancel_timers(self) -> None:
+        """Cancel pending timers."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if self._unsub_batch is not None:
+            self._unsub_batch()
+            self._unsub_batch = None
+
+    def _now(self) -> float:
+        """Return the monotonic loop time."""
+        return self.hass.loop.time()
+
+    @callback
+    def _async_flush_batch(self, _now) -> None:
+        """Refresh every house registered during setup."""
+        self._unsub_batch = None
+        batch, self._batch = self._batch, set()
+        _LOGGER.debug("Refreshing %s houses registered at setup", len(batch))
+        for house_id in batch:
+            self._async_start_refresh(house_id)
+
+    @callback
+    def _async_arm_timer(self) -> None:
+        """Wake up when the earliest house is due."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if not self._due:
+            return
+        delay = max(0.0, min(self._due.values()) - self._now())
+        self._unsub_timer = async_call_later(self.hass, delay, self._async_on_timer)
+
+    @callback
+    def _async_on_timer(self, _now) -> None:
+        """Start the refreshes that are due."""
+        self._unsub_timer = None
+        now = self._now()
+        for house_id, due in list(self._due.items()):
+            if due <= now:
+                del self._due[house_id]
+                self._async_start_refresh(house_id)
+        self._async_arm_timer()
+
+    @callback
+    def _async_start_refresh(self, house_id: str) -> None:
+        """Run one refresh in the background."""
+        if (coordinator := self._coordinators.get(house_id)) is None:
+            return
+        self.hass.async_create_background_task(
+            self._async_refresh(coordinator), f"{DOMAIN}_refresh_{house_id}"
+        )
+
+    async def _async_refresh(
+        self, coordinator: SQZLSWaterDataUpdateCoordinator
+    ) -> None:
+        """Refresh a coordinator inside a slot, then plan the next run."""
+        async with self.slot():
+            await coordinator.async_refresh()
+
+        house_id = coordinator.house_id
+        if self._coordinators.get(house_id) is not coordinator:
+            return
+        interval = coordinator.next_refresh_interval()
+        jitter = random.uniform(-SCHEDULER_JITTER, SCHEDULER_JITTER) * interval
+        self._due[house_id] = self._now() + interval + jitter
+        self._async_arm_timer()
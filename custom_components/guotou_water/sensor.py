@@ -1,17 +1,41 @@
 """Sensor platform for SQZLS Water integration."""
 from __future__ import annotations
 
+import datetime
 import logging
 from typing import Any
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import MATCH_ALL
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    MATCH_ALL,
+    EntityCategory,
+    UnitOfVolume,
+)
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_state_change_event
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import slugify
+from homeassistant.util.unit_conversion import VolumeConverter
 
-from .const import COORDINATOR, DOMAIN, SENSOR_TYPES, HISTORY_SENSOR_TYPE
+from .const import (
+    ANALYTICS_SENSOR_TYPES,
+    CONF_FLEET,
+    COORDINATOR,
+    DIAGNOSTIC_SENSOR_TYPES,
+    DOMAIN,
+    FLEET,
+    FLEET_SENSOR_TYPES,
+    HISTORY_FORMAT_COLUMNAR,
+    HISTORY_FORMAT_SUMMARY,
+    HISTORY_SENSOR_TYPE,
+    SENSOR_TYPES,
+    TARIFF_SENSOR_TYPES,
+)
+from .fleet import FleetRollup, async_get_fleet
+from .metrics import EndpointMetrics, RefreshMetrics, RollingStats
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,6 +46,14 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up SQZLS Water sensor entities from a config entry."""
+    if config_entry.data.get(CONF_FLEET):
+        fleet = async_get_fleet(hass)
+        async_add_entities(
+            SQZLSWaterFleetSensor(sensor_type, fleet)
+            for sensor_type in FLEET_SENSOR_TYPES
+        )
+        return
+
     coordinator = hass.data[DOMAIN][config_entry.entry_id][COORDINATOR]
 
     sensors = []
@@ -29,29 +61,71 @@ async def async_setup_entry(
     for sensor_type in SENSOR_TYPES:
         sensors.append(SQZLSWaterSensor(sensor_type, coordinator))
     
+    # Forecast, baseline and anomaly sensors computed from the history
+    for sensor_type in ANALYTICS_SENSOR_TYPES:
+        sensors.append(SQZLSWaterAnalyticsSensor(sensor_type, coordinator))
+
+    # Month-to-date and projected bill from the local tariff
+    for sensor_type in TARIFF_SENSOR_TYPES:
+        sensors.append(SQZLSWaterEstimateSensor(sensor_type, coordinator))
+
     # History sensor (stores full historical data, attributes excluded from recorder)
     sensors.append(SQZLSWaterHistorySensor(coordinator))
 
+    # Diagnostic sensors (disabled by default)
+    for sensor_type in DIAGNOSTIC_SENSOR_TYPES:
+        sensors.append(SQZLSWaterDiagnosticSensor(sensor_type, coordinator))
+
     async_add_entities(sensors, False)
 
 
+def _entity_id(coordinator, kind: str) -> str:
+    """Return the entity id of one sensor of a house."""
+    # Entities registered before keep their entity id (sensor.guotou_water_<kind>)
+    return f"sensor.{DOMAIN}_{slugify(coordinator.house_id)}_{kind}"
+
+
 class SQZLSWaterSensor(CoordinatorEntity, SensorEntity):
     """Define a SQZLS Water sensor entity."""
 
     _attr_has_entity_name = True
+    _types = SENSOR_TYPES
 
     def __init__(self, kind: str, coordinator) -> None:
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._kind = kind
         self._attr_unique_id = f"{DOMAIN}_{kind}_{coordinator.house_id}"
-        # Set fixed entity_id (English format)
-        self.entity_id = f"sensor.guotou_water_{kind}"
+        # Set fixed entity_id (English format), one set per house
+        self.entity_id = _entity_id(coordinator, kind)
+        self._written_state: tuple | None = None
+
+    def _state_key(self) -> tuple:
+        """Return everything that ends up in the state, except querytime."""
+        data = self.coordinator.data or {}
+        key = (self.available, self.coordinator.stale, data.get(self._kind))
+        if self._kind == "current_reading":
+            key += (data.get("meter_id"), data.get("cost_category"))
+        return key
+
+    async def async_added_to_hass(self) -> None:
+        """Remember the state written when the entity was added."""
+        await super().async_added_to_hass()
+        self._written_state = self._state_key()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when this sensor's value changed."""
+        state_key = self._state_key()
+        if state_key == self._written_state:
+            return
+        self._written_state = state_key
+        super()._handle_coordinator_update()
 
     @property
     def name(self) -> str:
         """Return the name of the sensor."""
-        return SENSOR_TYPES[self._kind]["name"]
+        return self._types[self._kind]["name"]
 
     @property
     def device_info(self):
@@ -63,6 +137,11 @@ class SQZLSWaterSensor(CoordinatorEntity, SensorEntity):
             "model": "智能水表",
         }
 
+    @property
+    def available(self) -> bool:
+        """Keep restored snapshot values visible while the refresh is pending."""
+        return super().available or self.coordinator.stale
+
     @property
     def native_value(self):
         """Return the state of the sensor."""
@@ -73,17 +152,17 @@ class SQZLSWaterSensor(CoordinatorEntity, SensorEntity):
     @property
     def icon(self) -> str:
         """Return the icon of the sensor."""
-        return SENSOR_TYPES[self._kind]["icon"]
+        return self._types[self._kind]["icon"]
 
     @property
     def native_unit_of_measurement(self) -> str | None:
         """Return the unit of measurement."""
-        return SENSOR_TYPES[self._kind].get("unit_of_measurement")
+        return self._types[self._kind].get("unit_of_measurement")
 
     @property
     def device_class(self) -> str | None:
         """Return the device class."""
-        return SENSOR_TYPES[self._kind].get("device_class")
+        return self._types[self._kind].get("device_class")
 
     @property
     def extra_state_attributes(self) -> dict:
@@ -92,6 +171,7 @@ class SQZLSWaterSensor(CoordinatorEntity, SensorEntity):
         if self.coordinator.data:
             attrs["querytime"] = self.coordinator.data.get("querytime")
             attrs["house_id"] = self.coordinator.data.get("house_id")
+            attrs["stale"] = self.coordinator.stale
             
             # Add extra info for current_reading sensor
             if self._kind == "current_reading":
@@ -100,6 +180,143 @@ class SQZLSWaterSensor(CoordinatorEntity, SensorEntity):
         return attrs
 
 
+class SQZLSWaterAnalyticsSensor(SQZLSWaterSensor):
+    """Define a sensor computed locally from the monthly history."""
+
+    _types = ANALYTICS_SENSOR_TYPES
+
+    def _state_key(self) -> tuple:
+        """Include the analytics details shown as attributes."""
+        data = self.coordinator.data or {}
+        return super()._state_key() + (data.get("analytics"),)
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the baseline and anomaly details behind the value."""
+        attrs = super().extra_state_attributes
+        details = (self.coordinator.data or {}).get("analytics") or {}
+        if self._kind == "usage_anomaly_score":
+            for key in ("anomaly_month", "anomaly_volume", "anomaly_expected"):
+                attrs[key] = details.get(key)
+        elif self._kind == "monthly_baseline":
+            attrs["seasonal_profile"] = details.get("seasonal_profile")
+        else:
+            for key in (
+                "months",
+                "remaining_months",
+                "trailing_12_volume",
+                "previous_12_volume",
+            ):
+                attrs[key] = details.get(key)
+        return attrs
+
+
+class SQZLSWaterEstimateSensor(SQZLSWaterSensor):
+    """Define a bill estimate from the local tariff.
+
+    Besides coordinator updates, the estimate follows the state of the
+    configured meter entity, so it moves with the meter between API polls.
+    """
+
+    _types = TARIFF_SENSOR_TYPES
+
+    def __init__(self, kind: str, coordinator) -> None:
+        """Initialize the sensor."""
+        super().__init__(kind, coordinator)
+        self._estimate: dict[str, Any] | None = None
+        self._meter_entity: str | None = None
+        self._unsub_meter: CALLBACK_TYPE | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Start following the meter entity."""
+        self._async_track_meter()
+        self.async_on_remove(self._async_untrack_meter)
+        await super().async_added_to_hass()
+
+    @callback
+    def _async_track_meter(self) -> None:
+        """Follow the meter entity from the options, if it changed."""
+        if self.coordinator.meter_entity == self._meter_entity:
+            return
+        self._async_untrack_meter()
+        self._meter_entity = self.coordinator.meter_entity
+        if self._meter_entity:
+            self._unsub_meter = async_track_state_change_event(
+                self.hass, [self._meter_entity], self._async_meter_changed
+            )
+
+    @callback
+    def _async_untrack_meter(self) -> None:
+        """Stop following the meter entity."""
+        if self._unsub_meter is not None:
+            self._unsub_meter()
+            self._unsub_meter = None
+
+    @callback
+    def _async_meter_changed(self, event: Event) -> None:
+        """Re-estimate with the new reading."""
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Follow a changed meter entity option, then update as usual."""
+        self._async_track_meter()
+        super()._handle_coordinator_update()
+
+    def _meter_reading(self) -> float | None:
+        """Return the meter entity's reading in m³, None if unusable."""
+        if not self._meter_entity:
+            return None
+        if (state := self.hass.states.get(self._meter_entity)) is None:
+            return None
+        try:
+            value = float(state.state)
+        except ValueError:
+            return None
+        unit = state.attributes.get(
+            ATTR_UNIT_OF_MEASUREMENT, UnitOfVolume.CUBIC_METERS
+        )
+        if unit == UnitOfVolume.CUBIC_METERS:
+            return value
+        if unit not in VolumeConverter.VALID_UNITS:
+            return None
+        return VolumeConverter.convert(value, unit, UnitOfVolume.CUBIC_METERS)
+
+    def _state_key(self) -> tuple:
+        """Estimate once per update; the estimate is the state."""
+        self._estimate = None
+        if self.coordinator.data:
+            self._estimate = self.coordinator.billing.estimate(
+                self.coordinator.data, self._meter_reading(), datetime.datetime.now()
+            )
+        return (self.available, self.coordinator.stale, self._estimate)
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the estimated amount."""
+        if self._estimate is None:
+            return None
+        key = "amount" if self._kind == "estimated_amount" else "projected_amount"
+        return self._estimate[key]
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the volumes, reading and tariff behind the estimate."""
+        attrs = super().extra_state_attributes
+        estimate = self._estimate or {}
+        if self._kind == "estimated_amount":
+            keys = ("volume", "reading", "reading_source", "start_reading", "tier")
+        else:
+            keys = ("volume", "projected_volume", "month_elapsed")
+        for key in keys:
+            attrs[key] = estimate.get(key)
+        attrs["price"] = estimate.get("price")
+        attrs["cost_category"] = (self.coordinator.data or {}).get("cost_category")
+        tariff = self.coordinator.billing.tariff
+        attrs["tariff"] = tariff.as_dict() if tariff is not None else None
+        return attrs
+
+
 class SQZLSWaterHistorySensor(CoordinatorEntity, SensorEntity):
     """Define a SQZLS Water history sensor entity.
     
@@ -118,7 +335,36 @@ class SQZLSWaterHistorySensor(CoordinatorEntity, SensorEntity):
         """Initialize the history sensor."""
         super().__init__(coordinator)
         self._attr_unique_id = f"{DOMAIN}_history_data_{coordinator.house_id}"
-        self.entity_id = f"sensor.guotou_water_history_data"
+        self.entity_id = _entity_id(coordinator, "history_data")
+        # Attributes are built once per coordinator update, not per access
+        self._attrs: dict[str, Any] | None = None
+        self._written_state: tuple | None = None
+
+    def _state_key(self) -> tuple:
+        """Return what decides whether the history state must be written."""
+        return (
+            self.available,
+            self.coordinator.stale,
+            self.coordinator.history_version,
+            self.coordinator.view_version,
+            self.coordinator.history_format,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Remember the state written when the entity was added."""
+        await super().async_added_to_hass()
+        self._written_state = self._state_key()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the history content changed."""
+        state_key = self._state_key()
+        if state_key == self._written_state:
+            return
+        self._written_state = state_key
+        # Drop the cached attributes before writing the new state
+        self._attrs = None
+        super()._handle_coordinator_update()
 
     @property
     def name(self) -> str:
@@ -135,12 +381,16 @@ class SQZLSWaterHistorySensor(CoordinatorEntity, SensorEntity):
             "model": "智能水表",
         }
 
+    @property
+    def available(self) -> bool:
+        """Keep restored snapshot values visible while the refresh is pending."""
+        return super().available or self.coordinator.stale
+
     @property
     def native_value(self):
         """Return the state of the sensor (count of history records)."""
         if self.coordinator.data:
-            monthly = len(self.coordinator.data.get("monthly_history", []))
-            return f"{monthly}月"
+            return f"{len(self.coordinator.history)}月"
         return "0月"
 
     @property
@@ -151,10 +401,192 @@ class SQZLSWaterHistorySensor(CoordinatorEntity, SensorEntity):
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return the state attributes with FULL historical data."""
+        if self._attrs is not None:
+            return self._attrs
+
         attrs: dict[str, Any] = {}
         if self.coordinator.data:
             attrs["querytime"] = self.coordinator.data.get("querytime")
             attrs["house_id"] = self.coordinator.data.get("house_id")
-            # Store complete historical data (for calendar and charts)
-            attrs["monthly_history"] = self.coordinator.data.get("monthly_history", [])
+            attrs["stale"] = self.coordinator.stale
+            attrs["history_version"] = self.coordinator.history_version
+            # 卡片通过 websocket 获取预计算的视图模型，版本不变时不重新渲染
+            attrs["view_api"] = f"{DOMAIN}/view_model"
+            attrs["view_version"] = self.coordinator.view_version
+            # Store complete historical data (for calendar and charts); the
+            # snapshot's objects are shared, not copied
+            history = self.coordinator.history
+            if self.coordinator.history_format == HISTORY_FORMAT_SUMMARY:
+                # 仅保留摘要，明细通过 websocket 命令按需获取
+                attrs["history_api"] = f"{DOMAIN}/history"
+                attrs["first_month"] = history.first_month
+                attrs["last_month"] = history.last_month
+            elif self.coordinator.history_format == HISTORY_FORMAT_COLUMNAR:
+                attrs["monthly_history_columns"] = history.columns
+            else:
+                attrs["monthly_history"] = history.entries
+        self._attrs = attrs
         return attrs
+
+
+def _rolling_value(stats: RollingStats) -> tuple[float | None, dict[str, Any]]:
+    """Return the median of a rolling window and its spread as attributes."""
+    summary = stats.as_dict()
+    value = summary.get("p50")
+    return value, {key: summary.get(key) for key in ("count", "last", "p95", "max")}
+
+
+def _failures_value(metrics: RefreshMetrics) -> tuple[int, dict[str, Any]]:
+    """Return the failed API calls since startup, split per endpoint."""
+    endpoints: dict[str, EndpointMetrics] = {
+        "bills": metrics.bills,
+        "house": metrics.house,
+    }
+    attrs: dict[str, Any] = {"refresh_failures": metrics.refresh_failures}
+    for name, endpoint in endpoints.items():
+        attrs[f"{name}_failures"] = endpoint.failure
+        attrs[f"{name}_retries"] = endpoint.retries
+        attrs[f"{name}_last_error"] = endpoint.last_error
+    return metrics.bills.failure + metrics.house.failure, attrs
+
+
+# How each diagnostic sensor reads its value from the refresh metrics
+DIAGNOSTIC_VALUES = {
+    "refresh_duration": lambda metrics: _rolling_value(metrics.refresh_ms),
+    "bills_latency": lambda metrics: _rolling_value(metrics.bills.total_ms),
+    "house_latency": lambda metrics: _rolling_value(metrics.house.total_ms),
+    "bills_response_size": lambda metrics: _rolling_value(
+        metrics.bills.response_bytes
+    ),
+    "api_failures": _failures_value,
+}
+
+
+class SQZLSWaterDiagnosticSensor(SensorEntity):
+    """Expose one refresh metric of the coordinator."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, kind: str, coordinator) -> None:
+        """Initialize the sensor."""
+        self._kind = kind
+        self.coordinator = coordinator
+        self._attr_unique_id = f"{DOMAIN}_{kind}_{coordinator.house_id}"
+        self.entity_id = _entity_id(coordinator, kind)
+        self._attr_name = DIAGNOSTIC_SENSOR_TYPES[kind]["name"]
+        self._attr_icon = DIAGNOSTIC_SENSOR_TYPES[kind]["icon"]
+        self._attr_native_unit_of_measurement = DIAGNOSTIC_SENSOR_TYPES[kind][
+            "unit_of_measurement"
+        ]
+        self._update_from_metrics()
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the metrics after every refresh."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.metrics.async_add_listener(self._handle_metrics_update)
+        )
+
+    def _update_from_metrics(self) -> None:
+        """Read the value and attributes from the metrics."""
+        value, attrs = DIAGNOSTIC_VALUES[self._kind](self.coordinator.metrics)
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = attrs
+
+    @callback
+    def _handle_metrics_update(self) -> None:
+        """Write the new value after a refresh."""
+        self._update_from_metrics()
+        self.async_write_ha_state()
+
+    @property
+    def device_info(self):
+        """Return device information."""
+        return {
+            "identifiers": {(DOMAIN, self.coordinator.house_id)},
+            "name": "国投水务水表",
+            "manufacturer": "国投水务",
+            "model": "智能水表",
+        }
+
+
+def _fleet_lowest_balance(fleet: FleetRollup) -> tuple[float | None, dict[str, Any]]:
+    """Return the lowest balance and the house it belongs to."""
+    lowest = fleet.lowest_balance()
+    if lowest is None:
+        return None, {"house_id": None}
+    return lowest[0], {"house_id": lowest[1]}
+
+
+# How each fleet sensor reads its value from the rollup
+FLEET_VALUES = {
+    "yearly_volume": lambda fleet: (
+        round(fleet.yearly_volume, 2),
+        {"houses": fleet.houses},
+    ),
+    "unpaid_amount": lambda fleet: (
+        round(fleet.unpaid_amount, 2),
+        {"houses": fleet.houses},
+    ),
+    "lowest_balance": _fleet_lowest_balance,
+    "houses_in_arrears": lambda fleet: (
+        len(fleet.arrears),
+        {"houses": fleet.houses, "house_ids": sorted(fleet.arrears)},
+    ),
+}
+
+
+class SQZLSWaterFleetSensor(SensorEntity):
+    """Expose one total of the fleet rollup."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(self, kind: str, fleet: FleetRollup) -> None:
+        """Initialize the sensor."""
+        self._kind = kind
+        self._fleet = fleet
+        self._attr_unique_id = f"{DOMAIN}_{FLEET}_{kind}"
+        self.entity_id = f"sensor.{DOMAIN}_{FLEET}_{kind}"
+        self._attr_name = FLEET_SENSOR_TYPES[kind]["name"]
+        self._attr_icon = FLEET_SENSOR_TYPES[kind]["icon"]
+        self._attr_native_unit_of_measurement = FLEET_SENSOR_TYPES[kind][
+            "unit_of_measurement"
+        ]
+        self._attr_device_class = FLEET_SENSOR_TYPES[kind]["device_class"]
+        self._written_state: tuple | None = None
+        self._update_from_fleet()
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the rollup."""
+        await super().async_added_to_hass()
+        self.async_on_remove(self._fleet.async_add_listener(self._handle_fleet_update))
+
+    def _update_from_fleet(self) -> bool:
+        """Read the value and attributes; return True if they changed."""
+        value, attrs = FLEET_VALUES[self._kind](self._fleet)
+        if (value, attrs) == self._written_state:
+            return False
+        self._written_state = (value, attrs)
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = attrs
+        return True
+
+    @callback
+    def _handle_fleet_update(self) -> None:
+        """Write state only when this total changed."""
+        if self._update_from_fleet():
+            self.async_write_ha_state()
+
+    @property
+    def device_info(self):
+        """Return device information."""
+        return {
+            "identifiers": {(DOMAIN, FLEET)},
+            "name": "国投水务汇总",
+            "manufacturer": "国投水务",
+            "model": "多户汇总",
+        }
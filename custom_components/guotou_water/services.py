@@ -0,0 +1,250 @@
+"""Services of the SQZLS Water integration."""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+import pathlib
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .api import async_get_client
+from .capture import TrafficCapture
+from .const import (
+    BACKFILL_MAX_CONCURRENT,
+    BACKFILL_MIN_YEAR,
+    CAPTURE,
+    CAPTURE_DIR,
+    COORDINATOR,
+    DOMAIN,
+    EVENT_BACKFILL_PROGRESS,
+    SERVICE_BACKFILL_HISTORY,
+    SERVICE_START_CAPTURE,
+    SERVICE_STOP_CAPTURE,
+)
+
+if TYPE_CHECKING:
+    from . import SQZLSWaterDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_HOUSE_ID = "house_id"
+ATTR_START_YEAR = "start_year"
+ATTR_END_YEAR = "end_year"
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_HOUSE_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Required(ATTR_START_YEAR): vol.All(
+            vol.Coerce(int), vol.Range(min=BACKFILL_MIN_YEAR)
+        ),
+        vol.Optional(ATTR_END_YEAR): vol.All(
+            vol.Coerce(int), vol.Range(min=BACKFILL_MIN_YEAR)
+        ),
+    }
+)
+
+START_CAPTURE_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_HOUSE_ID): vol.All(cv.ensure_list, [cv.string])}
+)
+
+
+@callback
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def _async_backfill(call: ServiceCall) -> ServiceResponse:
+        return await async_backfill_history(hass, call.data)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL_HISTORY,
+        _async_backfill,
+        schema=BACKFILL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    @callback
+    def _async_start_capture(call: ServiceCall) -> None:
+        async_start_capture(hass, call.data.get(ATTR_HOUSE_ID))
+
+    async def _async_stop_capture(call: ServiceCall) -> ServiceResponse:
+        return await async_stop_capture(hass)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_START_CAPTURE,
+        _async_start_capture,
+        schema=START_CAPTURE_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_STOP_CAPTURE,
+        _async_stop_capture,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _loaded_coordinators(
+    hass: HomeAssistant,
+) -> dict[str, SQZLSWaterDataUpdateCoordinator]:
+    """Return the coordinators of all loaded houses by house id."""
+    return {
+        entry_data[COORDINATOR].house_id: entry_data[COORDINATOR]
+        for entry_data in hass.data.get(DOMAIN, {}).values()
+        if isinstance(entry_data, dict) and COORDINATOR in entry_data
+    }
+
+
+async def async_backfill_history(
+    hass: HomeAssistant, data: dict[str, Any]
+) -> dict[str, Any]:
+    """Import listByMonth rows of whole years into the history stores.
+
+    The range is split into one request per house and year. All requests
+    share a pool of BACKFILL_MAX_CONCURRENT workers and go through the
+    client's rate limiter, so a fleet can be backfilled in one call.
+    Progress is fired as EVENT_BACKFILL_PROGRESS events.
+    """
+    this_year = datetime.date.today().year
+    start_year = data[ATTR_START_YEAR]
+    end_year = min(data.get(ATTR_END_YEAR, this_year), this_year)
+    if start_year > end_year:
+        raise ServiceValidationError(
+            f"start_year {start_year} is after end_year {end_year}"
+        )
+
+    coordinators = _loaded_coordinators(hass)
+    if house_ids := data.get(ATTR_HOUSE_ID):
+        unknown = [house_id for house_id in house_ids if house_id not in coordinators]
+        if unknown:
+            raise ServiceValidationError(f"House not loaded: {', '.join(unknown)}")
+        coordinators = {house_id: coordinators[house_id] for house_id in house_ids}
+    if not coordinators:
+        raise ServiceValidationError("No SQZLS Water house is loaded")
+
+    years = range(start_year, end_year + 1)
+    results = {
+        house_id: {
+            "months_before": len(coordinator.store.bills),
+            "rows": 0,
+            "failed_years": [],
+        }
+        for house_id, coordinator in coordinators.items()
+    }
+    total = len(coordinators) * len(years)
+    done = 0
+    semaphore = asyncio.Semaphore(BACKFILL_MAX_CONCURRENT)
+
+    async def _async_fetch_year(
+        coordinator: SQZLSWaterDataUpdateCoordinator, year: int
+    ) -> None:
+        nonlocal done
+        result = results[coordinator.house_id]
+        async with semaphore:
+            try:
+                # 每个年份只请求一次，不占用轮询的响应缓存
+                response = await coordinator.client.async_get_bills(
+                    coordinator.house_id,
+                    f"{year}-01-01",
+                    f"{year}-12-31",
+                    cache=False,
+                )
+            except Exception as error:  # noqa: BLE001
+                _LOGGER.warning(
+                    "Backfill of %s for house %s failed: %s",
+                    year,
+                    coordinator.house_id,
+                    error,
+                )
+                response = None
+
+        if response and response.get("code") == 200:
+            rows = response.get("rows", [])
+            coordinator.store.async_merge_bills(rows)
+            result["rows"] += len(rows)
+        else:
+            result["failed_years"].append(year)
+
+        done += 1
+        hass.bus.async_fire(
+            EVENT_BACKFILL_PROGRESS,
+            {
+                "house_id": coordinator.house_id,
+                "year": year,
+                "done": done,
+                "total": total,
+            },
+        )
+        _LOGGER.debug("Backfill progress %s/%s", done, total)
+
+    _LOGGER.info(
+        "开始补全历史: %s 户, %s-%s 年, 共 %s 个请求",
+        len(coordinators),
+        start_year,
+        end_year,
+        total,
+    )
+    await asyncio.gather(
+        *(
+            _async_fetch_year(coordinator, year)
+            for coordinator in coordinators.values()
+            for year in years
+        )
+    )
+
+    for house_id, coordinator in coordinators.items():
+        result = results[house_id]
+        result["failed_years"].sort()
+        result["new_months"] = len(coordinator.store.bills) - result.pop(
+            "months_before"
+        )
+        if result["new_months"]:
+            # Rebuild the history, sensors and statistics from the store
+            await coordinator.async_request_refresh()
+
+    _LOGGER.info("历史补全完成: %s", results)
+    return {"start_year": start_year, "end_year": end_year, "houses": results}
+
+
+@callback
+def async_start_capture(hass: HomeAssistant, house_ids: list[str] | None) -> None:
+    """Start recording the responses of the shared client."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if domain_data.get(CAPTURE) is not None:
+        raise ServiceValidationError("A capture is already running")
+    capture = domain_data[CAPTURE] = TrafficCapture(house_ids)
+    async_get_client(hass).capture = capture
+    _LOGGER.info(
+        "开始记录接口流量: %s", ", ".join(house_ids) if house_ids else "所有户号"
+    )
+
+
+async def async_stop_capture(hass: HomeAssistant) -> dict[str, Any]:
+    """Stop recording and write the capture under the config directory."""
+    domain_data = hass.data.get(DOMAIN, {})
+    if (capture := domain_data.pop(CAPTURE, None)) is None:
+        raise ServiceValidationError("No capture is running")
+    async_get_client(hass).capture = None
+
+    name = datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".jsonl.gz"
+    path = pathlib.Path(hass.config.path(CAPTURE_DIR, name))
+    size = await hass.async_add_executor_job(capture.save, path)
+    _LOGGER.info("接口流量已保存: %s (%s 条)", path, len(capture.exchanges))
+    return {
+        "path": str(path),
+        "exchanges": len(capture.exchanges),
+        "dropped": capture.dropped,
+        "bytes": size,
+    }
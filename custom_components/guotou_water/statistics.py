@@ -0,0 +1,135 @@
+"""Long-term statistics import for SQZLS Water monthly usage."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+import datetime
+import logging
+from typing import Any
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# (history field, statistic suffix, name, unit)
+STATISTICS = (
+    ("volume", "volume", "用水量", "m³"),
+    ("amount", "amount", "水费", "元"),
+)
+
+
+def statistic_id(house_id: str, suffix: str) -> str:
+    """Return the external statistic id of a house."""
+    return f"{DOMAIN}:{slugify(house_id)}_{suffix}"
+
+
+def _month_start(date: str) -> datetime.datetime:
+    """Return local midnight of the first day of a YYYY-MM-DD month."""
+    return dt_util.start_of_local_day(
+        datetime.date(int(date[:4]), int(date[5:7]), 1)
+    )
+
+
+@callback
+def _async_import_from(
+    hass: HomeAssistant,
+    house_id: str,
+    history: Sequence[dict[str, Any]],
+    first: str,
+) -> None:
+    """Write every month from the first one onward, with cumulative sums."""
+    for field, suffix, name, unit in STATISTICS:
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{name} {house_id}",
+            source=DOMAIN,
+            statistic_id=statistic_id(house_id, suffix),
+            unit_of_measurement=unit,
+        )
+        total = 0.0
+        statistics: list[StatisticData] = []
+        for entry in history:
+            total += entry[field]
+            if entry["date"] >= first:
+                statistics.append(
+                    StatisticData(
+                        start=_month_start(entry["date"]),
+                        state=entry[field],
+                        sum=round(total, 2),
+                    )
+                )
+        async_add_external_statistics(hass, metadata, statistics)
+
+
+def _first_missing(
+    hass: HomeAssistant, house_id: str, history: Sequence[dict[str, Any]]
+) -> str | None:
+    """Return the first month the recorder does not hold correctly.
+
+    Only the last imported hour of each statistic is read: if it is a month
+    of the history with the same cumulative sum, everything before it is in
+    place and only the later months are missing. Anything else (no rows, a
+    wiped database, a sum that drifted) means the whole history again.
+    """
+    first: str | None = None
+    for field, suffix, _name, _unit in STATISTICS:
+        stat_id = statistic_id(house_id, suffix)
+        rows = get_last_statistics(hass, 1, stat_id, False, {"sum"}).get(stat_id)
+        if not rows:
+            return history[0]["date"]
+        last_start, last_sum = rows[0]["start"], rows[0].get("sum")
+        total = 0.0
+        resume: str | None = history[0]["date"]
+        for index, entry in enumerate(history):
+            total += entry[field]
+            if _month_start(entry["date"]).timestamp() == last_start:
+                if last_sum is not None and round(total, 2) == round(last_sum, 2):
+                    following = history[index + 1 : index + 2]
+                    resume = following[0]["date"] if following else None
+                break
+        if resume is not None and (first is None or resume < first):
+            first = resume
+    return first
+
+
+async def async_import_statistics(
+    hass: HomeAssistant,
+    house_id: str,
+    history: Sequence[dict[str, Any]],
+    changed_months: set[str],
+) -> None:
+    """Write new or changed months of volume and amount to the recorder.
+
+    Sums are cumulative, so everything from the first month that changed
+    since the last import, or that the recorder does not actually hold, is
+    re-imported. Re-importing the same hours overwrites them, so a repeated
+    backfill is harmless.
+    """
+    if not history:
+        return
+    first = await get_instance(hass).async_add_executor_job(
+        _first_missing, hass, house_id, history
+    )
+    if changed_months:
+        earliest = min(changed_months)
+        first = earliest if first is None else min(first, earliest)
+    if first is None:
+        return
+
+    _async_import_from(hass, house_id, history, first)
+    _LOGGER.debug(
+        "Imported statistics for house %s from %s (%s changed months)",
+        house_id,
+        first,
+        len(changed_months),
+    )
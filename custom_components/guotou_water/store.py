@@ -0,0 +1,188 @@
+"""Persistent per-house bill history and snapshot for the SQZLS Water integration."""
+from __future__ import annotations
+
+import calendar
+import datetime
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+    VALIDATION_CACHE,
+    VALIDATION_CACHE_TTL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# listByMonth row fields kept on disk; everything else is dropped
+BILL_ROW_KEYS = (
+    "month",
+    "quantity",
+    "amount",
+    "payableAmount",
+    "paidAmount",
+    "isPaid",
+    "meterIndex",
+    "lastMeterIndex",
+    "unitPrice",
+    "meterId",
+    "costCategoryName",
+)
+
+
+def initial_sync_window(now: datetime.datetime) -> tuple[str, str]:
+    """Return the window requested when nothing is stored yet."""
+    # Query from last year January to next year January
+    return f"{now.year - 1}-01-01", f"{now.year + 1}-01-31"
+
+
+def _month_end(year: int, month: int) -> str:
+    """Return the last day of a month as YYYY-MM-DD."""
+    if month > 12:
+        year, month = year + 1, month - 12
+    return f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
+
+
+@callback
+def async_cache_validation(
+    hass: HomeAssistant,
+    house_id: str,
+    window: tuple[str, str],
+    response: dict[str, Any],
+) -> None:
+    """Keep a config flow listByMonth response for the first refresh."""
+    cache = hass.data.setdefault(DOMAIN, {}).setdefault(VALIDATION_CACHE, {})
+    now = time.monotonic()
+    # Flows that were aborted never pick their response up
+    expired = [
+        key
+        for key, (added, *_) in cache.items()
+        if now - added > VALIDATION_CACHE_TTL
+    ]
+    for key in expired:
+        del cache[key]
+    cache[house_id] = (now, window, response)
+
+
+@callback
+def async_pop_validation(
+    hass: HomeAssistant, house_id: str
+) -> tuple[tuple[str, str], dict[str, Any]] | None:
+    """Return and forget a recent validation response (window, response)."""
+    cache = hass.data.get(DOMAIN, {}).get(VALIDATION_CACHE, {})
+    if (cached := cache.pop(house_id, None)) is None:
+        return None
+    added, window, response = cached
+    if time.monotonic() - added > VALIDATION_CACHE_TTL:
+        return None
+    return window, response
+
+
+class SQZLSWaterStore:
+    """Bill rows and last good payload of one house, persisted in .storage."""
+
+    def __init__(self, hass: HomeAssistant, house_id: str) -> None:
+        """Initialize the store."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{house_id}"
+        )
+        self.bills: dict[str, dict[str, Any]] = {}
+        self.snapshot: dict[str, Any] | None = None
+        self.change_days: list[int] = []
+        # Months merged since the coordinator last aggregated them (not persisted)
+        self.changed_months: set[str] = set()
+        # Bumped whenever merged rows change the stored bills
+        self.revision = 0
+        # Kept up to date on merge, so the sync window needs no full scan
+        self._unpaid_months: set[str] = set()
+        self._latest_month = ""
+
+    async def async_load(self) -> None:
+        """Load the stored bill rows."""
+        data = await self._store.async_load() or {}
+        self.bills = data.get("bills", {})
+        self.snapshot = data.get("snapshot")
+        self.change_days = data.get("change_days", [])
+        for month, row in self.bills.items():
+            self._index_month(month, row)
+        _LOGGER.debug("Loaded %s stored bill months", len(self.bills))
+
+    async def async_remove(self) -> None:
+        """Delete the stored data (config entry removed)."""
+        await self._store.async_remove()
+
+    def sync_window(self, now: datetime.datetime) -> tuple[str, str]:
+        """Return the month range that still needs to be requested.
+
+        Settled months never change, so only the latest known month, any
+        unpaid month and the current month are fetched again.
+        """
+        if not self.bills:
+            return initial_sync_window(now)
+
+        begin = min(
+            *self._unpaid_months, self._latest_month, f"{now.year}-{now.month:02d}-01"
+        )
+        return begin, _month_end(now.year, now.month + 1)
+
+    def _index_month(self, month: str, row: dict[str, Any]) -> None:
+        """Track the latest month and the unpaid months."""
+        if month > self._latest_month:
+            self._latest_month = month
+        if row.get("isPaid", True):
+            self._unpaid_months.discard(month)
+        else:
+            self._unpaid_months.add(month)
+
+    @callback
+    def async_merge_bills(self, rows: list[dict[str, Any]]) -> bool:
+        """Merge freshly fetched rows and schedule a save; return True if changed."""
+        changed = False
+        for row in rows:
+            month = row.get("month")
+            if not month:
+                continue
+            slim = {key: row[key] for key in BILL_ROW_KEYS if key in row}
+            if self.bills.get(month) != slim:
+                self.bills[month] = slim
+                self.changed_months.add(month)
+                self._index_month(month, slim)
+                changed = True
+
+        if changed:
+            self.revision += 1
+            self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+        return changed
+
+    @callback
+    def async_save_snapshot(self, data: dict[str, Any]) -> None:
+        """Remember the last successful coordinator payload.
+
+        monthly_history is left out: it is built from the bills stored next
+        to it, and would otherwise be written to disk twice.
+        """
+        self.snapshot = {
+            key: value for key, value in data.items() if key != "monthly_history"
+        }
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @callback
+    def async_save_change_days(self, change_days: list[int]) -> None:
+        """Remember the days of month on which the data changed."""
+        self.change_days = list(change_days)
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to persist."""
+        return {
+            "bills": self.bills,
+            "snapshot": self.snapshot,
+            "change_days": self.change_days,
+        }
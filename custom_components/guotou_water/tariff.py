@@ -0,0 +1,265 @@
+"""Local tariff fitted to the bill history, and bill estimates from a reading."""
+from __future__ import annotations
+
+import bisect
+from collections.abc import Sequence
+import datetime
+import math
+from operator import itemgetter
+import statistics
+from typing import Any
+
+from .const import (
+    TARIFF_FIT_MARGIN,
+    TARIFF_PERIOD_MONTH,
+    TARIFF_PERIOD_YEAR,
+    TARIFF_WINDOW_MONTHS,
+)
+
+_DATE = itemgetter("date")
+
+
+class Tariff:
+    """Step prices: prices[i] applies up to limits[i] m³, the last one without limit.
+
+    With period "year" the limits apply to the volume accumulated since
+    January (阶梯水价按年), with "month" to the volume of the month alone.
+    """
+
+    __slots__ = ("period", "limits", "prices", "fit_error")
+
+    def __init__(
+        self,
+        period: str,
+        limits: tuple[float, ...],
+        prices: tuple[float, ...],
+    ) -> None:
+        """Initialize the tariff; len(limits) == len(prices) - 1."""
+        self.period = period
+        self.limits = limits
+        self.prices = prices
+        # Mean absolute error against the billed amounts, share of the total
+        self.fit_error: float | None = None
+
+    def tier(self, position: float) -> int:
+        """Return the index of the tier the given period volume falls in."""
+        return bisect.bisect_right(self.limits, position)
+
+    def cost(self, start: float, volume: float) -> float:
+        """Return the price of `volume` m³ used after `start` m³ of the period."""
+        total = 0.0
+        position, end = start, start + volume
+        for index in range(self.tier(start), len(self.prices)):
+            limit = self.limits[index] if index < len(self.limits) else math.inf
+            total += (min(end, limit) - position) * self.prices[index]
+            if end <= limit:
+                break
+            position = limit
+        return total
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the tariff for attributes and diagnostics."""
+        return {
+            "period": self.period,
+            "tiers": [
+                {"up_to": limit, "price": price}
+                for limit, price in zip((*self.limits, None), self.prices)
+            ],
+            "fit_error": self.fit_error,
+        }
+
+
+def _fit_limits(
+    samples: list[tuple[float, dict[str, Any]]], levels: list[float]
+) -> tuple[float, ...] | None:
+    """Estimate the tier limits from months tagged with the price they reached.
+
+    A month billed at level k that paid more than the tiers below would
+    charge, but less than level k for everything past the previous limit,
+    crossed the limit: its surplus over the lower tiers was paid for the
+    volume above the limit, which gives the limit. Without such a month the
+    limit is put halfway between the highest volume billed below level k
+    and the lowest volume at which level k was already charged.
+    """
+    level_of = {price: index for index, price in enumerate(levels)}
+    tagged = [
+        (start, entry, level_of[round(entry["unit_price"], 2)])
+        for start, entry in samples
+    ]
+    limits: list[float] = []
+    for level in range(1, len(levels)):
+        low, high = levels[level - 1], levels[level]
+        below = Tariff(TARIFF_PERIOD_MONTH, tuple(limits), tuple(levels[:level]))
+        previous = limits[-1] if limits else 0.0
+        floor = max(
+            (start + entry["volume"] for start, entry, tag in tagged if tag < level),
+            default=0.0,
+        )
+        crossings = []
+        first_seen = math.inf
+        for start, entry, tag in tagged:
+            if tag < level:
+                continue
+            first_seen = min(first_seen, start)
+            if tag != level:
+                continue
+            end = start + entry["volume"]
+            # Charged high instead of low for everything above the limit;
+            # amounts are rounded to cents, so leave a cent of slack
+            extra = entry["amount"] - below.cost(start, entry["volume"])
+            if 0.01 < extra < (end - max(start, previous)) * (high - low) - 0.01:
+                crossings.append(end - extra / (high - low))
+        if crossings:
+            limit = statistics.median(crossings)
+        else:
+            limit = (floor + max(floor, first_seen)) / 2
+        if limit <= previous:
+            # The months contradict step prices on this period
+            return None
+        limits.append(round(limit, 1))
+    return tuple(limits)
+
+
+def _fit_error(
+    tariff: Tariff, window: list[tuple[float, dict[str, Any]]]
+) -> float | None:
+    """Return how far the tariff is from the billed amounts, None if unbilled."""
+    billed = error = 0.0
+    for year_start, entry in window:
+        if entry["amount"] <= 0:
+            continue
+        start = year_start if tariff.period == TARIFF_PERIOD_YEAR else 0.0
+        error += abs(tariff.cost(start, entry["volume"]) - entry["amount"])
+        billed += entry["amount"]
+    return round(error / billed, 4) if billed else None
+
+
+def infer_tariff(history: Sequence[dict[str, Any]]) -> Tariff | None:
+    """Fit the tariff that best explains the recent bills.
+
+    Every distinct unit_price of the last TARIFF_WINDOW_MONTHS billed months
+    is taken as one tier. Tier limits are fitted both to the yearly and to
+    the monthly volume, and a tiered model is only preferred to the flat
+    latest price if it matches the billed amounts clearly better. A price
+    revision inside the window fits neither and falls back to flat.
+    """
+    # Volume of the year used before each month
+    window: list[tuple[float, dict[str, Any]]] = []
+    year, total = "", 0.0
+    for entry in history:
+        if entry["date"][:4] != year:
+            year, total = entry["date"][:4], 0.0
+        if entry["unit_price"] > 0:
+            window.append((total, entry))
+        total += entry["volume"]
+    window = window[-TARIFF_WINDOW_MONTHS:]
+    if not window:
+        return None
+
+    best = Tariff(TARIFF_PERIOD_MONTH, (), (round(window[-1][1]["unit_price"], 2),))
+    best.fit_error = _fit_error(best, window)
+    levels = sorted({round(entry["unit_price"], 2) for _, entry in window})
+    if len(levels) == 1 or best.fit_error is None:
+        return best
+    for period in (TARIFF_PERIOD_YEAR, TARIFF_PERIOD_MONTH):
+        samples = [
+            (start if period == TARIFF_PERIOD_YEAR else 0.0, entry)
+            for start, entry in window
+        ]
+        if (limits := _fit_limits(samples, levels)) is None:
+            continue
+        tariff = Tariff(period, limits, tuple(levels))
+        tariff.fit_error = _fit_error(tariff, window)
+        if tariff.fit_error + TARIFF_FIT_MARGIN < best.fit_error:
+            best = tariff
+    return best
+
+
+class BillEstimator:
+    """Month-to-date and projected bill of one house, without API calls.
+
+    The tariff is fitted once per history version; an estimate then only
+    needs the current meter reading. The month starts at the reading of the
+    last bill before it (or the current bill's previous reading), so the
+    estimate covers the usage since the last meter reading of the water
+    company, taken as the start of the month.
+    """
+
+    def __init__(self) -> None:
+        """Initialize without history."""
+        self.tariff: Tariff | None = None
+        self._history: Sequence[dict[str, Any]] = ()
+        # (month, reading at its start, volume of the year before it)
+        self._month: tuple[str, float | None, float] | None = None
+
+    def update(self, history: Sequence[dict[str, Any]]) -> None:
+        """Fit the tariff to a new version of the history."""
+        self._history = history
+        self.tariff = infer_tariff(history)
+        self._month = None
+
+    def _month_start(self, month: str) -> tuple[float | None, float]:
+        """Return the reading the month started at and the year's volume before it."""
+        if self._month is not None and self._month[0] == month:
+            return self._month[1], self._month[2]
+        history = self._history
+        index = bisect.bisect_left(history, month, key=_DATE)
+        if index < len(history) and history[index]["date"] == month:
+            reading = history[index]["last_reading"]
+        elif index:
+            reading = history[index - 1]["reading"]
+        else:
+            reading = None
+        before = 0.0
+        for position in range(index - 1, -1, -1):
+            if history[position]["date"][:4] != month[:4]:
+                break
+            before += history[position]["volume"]
+        self._month = (month, reading, before)
+        return reading, before
+
+    def estimate(
+        self, data: dict[str, Any], reading: float | None, now: datetime.datetime
+    ) -> dict[str, Any] | None:
+        """Return the bill of the current month so far and at its end.
+
+        `reading` is the meter index from a local sensor; without one (or if
+        it is behind the last bill) the API's current_reading is used. The
+        rest of the month is expected to follow the seasonal baseline, or
+        the run rate so far when there is none.
+        """
+        tariff = self.tariff
+        if tariff is None:
+            if not (unit_price := data.get("unit_price")):
+                return None
+            tariff = Tariff(TARIFF_PERIOD_MONTH, (), (unit_price,))
+
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
+        start_reading, before = self._month_start(month_start.strftime("%Y-%m-01"))
+        source = "meter_entity"
+        if reading is None or start_reading is None or reading < start_reading:
+            reading, source = data.get("current_reading"), "api"
+        if reading is None or start_reading is None:
+            return None
+
+        volume = max(0.0, reading - start_reading)
+        offset = before if tariff.period == TARIFF_PERIOD_YEAR else 0.0
+        elapsed = (now - month_start) / (next_month - month_start)
+        rate = data.get("monthly_baseline")
+        if rate is None:
+            rate = volume / elapsed if elapsed > 0 else 0.0
+        projected = volume + (1 - elapsed) * rate
+        tier = tariff.tier(offset + volume)
+        return {
+            "reading": reading,
+            "reading_source": source,
+            "start_reading": start_reading,
+            "volume": round(volume, 2),
+            "amount": round(tariff.cost(offset, volume), 2),
+            "projected_volume": round(projected, 2),
+            "projected_amount": round(tariff.cost(offset, projected), 2),
+            "tier": tier + 1,
+            "price": tariff.prices[tier],
+            "month_elapsed": round(elapsed, 3),
+        }
@@ -0,0 +1,111 @@
+"""Precomputed view model of the water-info-card."""
+from __future__ import annotations
+
+import bisect
+from collections.abc import Sequence
+import datetime
+from typing import Any
+
+# Bars shown in the monthly chart
+CHART_MONTHS = 12
+
+
+def _unit_price(volume: float, amount: float) -> float | None:
+    """Return the effective price of one month."""
+    return round(amount / volume, 2) if volume > 0 else None
+
+
+def build_view_model(
+    history: Sequence[dict[str, Any]], now: datetime.datetime, version: int
+) -> dict[str, Any]:
+    """Build the year rollups and the chart from monthly_history in one pass.
+
+    - years: per-year totals by year, with the paid and unpaid months and
+      the volume change against the year before
+    - chart: the last CHART_MONTHS months up to the current one as parallel
+      series, with month-over-month deltas and the y-axis ticks
+
+    The calendar is not part of it: build_calendar makes the grid of the
+    one year a card shows.
+    """
+    years: dict[str, dict[str, Any]] = {}
+    for entry in history:
+        year, volume, amount = entry["date"][:4], entry["volume"], entry["amount"]
+        if (rollup := years.get(year)) is None:
+            rollup = years[year] = {
+                "volume": 0.0,
+                "amount": 0.0,
+                "months": 0,
+                "paid_months": 0,
+                "unpaid_months": 0,
+            }
+        rollup["volume"] += volume
+        rollup["amount"] += amount
+        rollup["months"] += 1
+        if entry["is_paid"] in (True, "true"):
+            rollup["paid_months"] += 1
+        else:
+            rollup["unpaid_months"] += 1
+
+    previous_volume = None
+    for rollup in years.values():
+        rollup["volume"] = round(rollup["volume"], 2)
+        rollup["amount"] = round(rollup["amount"], 2)
+        rollup["delta_volume"] = (
+            round(rollup["volume"] - previous_volume, 2)
+            if previous_volume is not None
+            else None
+        )
+        previous_volume = rollup["volume"]
+
+    # Entries up to and including the current month
+    current = f"{now.year}-{now.month:02d}-01"
+    end = bisect.bisect_right(history, current, key=lambda entry: entry["date"])
+    start = max(0, end - CHART_MONTHS)
+    window = history[start:end]
+    volumes = [entry["volume"] for entry in window]
+    previous = history[start - 1]["volume"] if start > 0 else None
+    deltas = []
+    for volume in volumes:
+        deltas.append(round(volume - previous, 2) if previous is not None else None)
+        previous = volume
+    top = max(volumes + [0.1])
+
+    return {
+        "version": version,
+        "month": current[:7],
+        "latest": history[-1]["date"] if history else None,
+        "years": years,
+        "chart": {
+            "dates": [entry["date"] for entry in window],
+            "labels": [
+                f"{entry['date'][2:4]}-{entry['date'][5:7]}" for entry in window
+            ],
+            "volume": volumes,
+            "amount": [entry["amount"] for entry in window],
+            "unit_price": [
+                _unit_price(entry["volume"], entry["amount"]) for entry in window
+            ],
+            "is_paid": [entry["is_paid"] in (True, "true") for entry in window],
+            "delta": deltas,
+            "heights": [round(volume / top * 100, 1) for volume in volumes],
+            "ticks": [0, round(top / 2), round(top)],
+        },
+    }
+
+
+def build_calendar(entries: Sequence[dict[str, Any]]) -> dict[str, Any]:
+    """Build the calendar grid of one year from that year's entries.
+
+    Twelve [volume, amount, unit price, is_paid] cells (None for months
+    without usage) and the index of the latest month with a bill.
+    """
+    cells: list[list[Any] | None] = [None] * 12
+    latest = -1
+    for entry in entries:
+        volume, amount = entry["volume"], entry["amount"]
+        month = int(entry["date"][5:7]) - 1
+        is_paid = entry["is_paid"] in (True, "true")
+        cells[month] = [volume, amount, _unit_price(volume, amount), is_paid]
+        latest = max(latest, month)
+    return {"cells": cells, "latest": latest}
@@ -0,0 +1,113 @@
+"""Websocket API for the SQZLS Water integration."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.components.websocket_api.messages import construct_result_message
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    COORDINATOR,
+    DOMAIN,
+    WS_HISTORY_DEFAULT_LIMIT,
+    WS_HISTORY_MAX_LIMIT,
+)
+
+if TYPE_CHECKING:
+    from . import SQZLSWaterDataUpdateCoordinator
+
+MONTH_PATTERN = r"^\d{4}-\d{2}"
+
+
+@callback
+def async_register_websocket_commands(hass: HomeAssistant) -> None:
+    """Register the websocket commands."""
+    websocket_api.async_register_command(hass, ws_history)
+    websocket_api.async_register_command(hass, ws_view_model)
+
+
+@callback
+def async_get_coordinator(
+    hass: HomeAssistant, house_id: str
+) -> SQZLSWaterDataUpdateCoordinator | None:
+    """Return the coordinator of a loaded house, if any."""
+    for entry_data in hass.data.get(DOMAIN, {}).values():
+        if not isinstance(entry_data, dict) or COORDINATOR not in entry_data:
+            continue
+        coordinator = entry_data[COORDINATOR]
+        if coordinator.house_id == house_id:
+            return coordinator
+    return None
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required("house_id"): str,
+        vol.Optional("start"): vol.Match(MONTH_PATTERN),
+        vol.Optional("end"): vol.Match(MONTH_PATTERN),
+        vol.Optional("offset", default=0): vol.All(int, vol.Range(min=0)),
+        vol.Optional("limit", default=WS_HISTORY_DEFAULT_LIMIT): vol.All(
+            int, vol.Range(min=1, max=WS_HISTORY_MAX_LIMIT)
+        ),
+    }
+)
+@callback
+def ws_history(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Return one page of monthly history for a house and month range."""
+    coordinator = async_get_coordinator(hass, msg["house_id"])
+    if coordinator is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "Unknown house_id"
+        )
+        return
+
+    # 已序列化的页面按历史版本缓存，所有连接共用
+    payload = coordinator.history.page_json(
+        msg.get("start"), msg.get("end"), msg["offset"], msg["limit"]
+    )
+    connection.send_message(construct_result_message(msg["id"], payload))
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/view_model",
+        vol.Required("house_id"): str,
+        vol.Optional("year"): vol.All(int, vol.Range(min=1, max=9999)),
+        vol.Optional("version"): int,
+    }
+)
+@callback
+def ws_view_model(
+    hass: HomeAssistant,
+    connection: websocket_api.ActiveConnection,
+    msg: dict[str, Any],
+) -> None:
+    """Return the card view model, or only its version if the caller has it.
+
+    The calendar is only included for `year` (by default the current one);
+    a caller that changes year must not pass the version it already has.
+    """
+    coordinator = async_get_coordinator(hass, msg["house_id"])
+    if coordinator is None or coordinator.view_model is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "Unknown house_id"
+        )
+        return
+
+    if msg.get("version") == coordinator.view_version:
+        connection.send_result(
+            msg["id"], {"version": coordinator.view_version, "unchanged": True}
+        )
+        return
+    year = msg.get("year", int(coordinator.view_model["month"][:4]))
+    connection.send_message(
+        construct_result_message(msg["id"], coordinator.view_model_json(year))
+    )
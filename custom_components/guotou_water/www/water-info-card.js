@@ -5,14 +5,19 @@
  * 功能: 余额显示、月度账单日历、交互式图表、缴费状态
  */
 
+// 无历史数据时共用同一个空数组，保证缓存按引用命中
+const EMPTY_HISTORY = [];
+
 class WaterInfoCard extends HTMLElement {
   constructor() {
     super();
     this.attachShadow({ mode: 'open' });
     this._currentView = 'overview';
     this._calendarMonth = new Date();
-    this._lastDataHash = null;
+    this._renderKey = null;
     this._animationPlayed = {};
+    this._view = null;
+    this._viewPending = null;
   }
 
   set hass(hass) {
@@ -30,7 +35,9 @@ class WaterInfoCard extends HTMLElement {
   _getState(entityId) {
     if (!entityId || !this._hass) return null;
     const entity = this._hass.states[entityId];
-    return entity ? entity.state : null;
+    // unknown 表示尚无数据 (区别于 0 用量)
+    if (!entity || entity.state === 'unknown' || entity.state === 'unavailable') return null;
+    return entity.state;
   }
 
   _getAttribute(entityId, attr) {
@@ -39,6 +46,128 @@ class WaterInfoCard extends HTMLElement {
     return entity && entity.attributes ? entity.attributes[attr] : null;
   }
 
+  // 列存格式 (monthly_history_columns) 还原为逐月对象，同一份数据只解码一次
+  _decodeHistoryColumns(columns) {
+    if (!columns || !Array.isArray(columns.date)) return EMPTY_HISTORY;
+    if (this._decodedColumns === columns) return this._decodedHistory;
+
+    const fields = Object.keys(columns);
+    const history = columns.date.map((_, i) => {
+      const item = {};
+      fields.forEach(field => { item[field] = columns[field][i]; });
+      return item;
+    });
+    this._decodedColumns = columns;
+    this._decodedHistory = history;
+    return history;
+  }
+
+  // 视图模型由集成预计算，只含日历当前年份的格子；同一版本和年份只请求一次，
+  // 新版本或新年份到达前继续显示旧的
+  _fetchViewModel(api, houseId, version, year) {
+    const key = `${houseId}|${version}|${year}`;
+    const view = this._view && this._view.houseId === houseId ? this._view : null;
+    if (view && view.key === key) return view.model;
+    if (this._viewPending !== key) {
+      this._viewPending = key;
+      // 换年份时需要该年的日历，不能只确认版本
+      const known = view && view.year === year ? view.version : undefined;
+      this._hass.callWS({ type: api, house_id: houseId, year, version: known }).then(result => {
+        const model = result.unchanged ? view.model : result.view_model;
+        this._view = { key: `${houseId}|${result.version}|${year}`, houseId, year, version: result.version, model };
+        this._updateCard();
+      }).catch(err => {
+        console.warn('water-info-card: 获取视图模型失败', err);
+      }).finally(() => {
+        if (this._viewPending === key) this._viewPending = null;
+      });
+    }
+    return view ? view.model : null;
+  }
+
+  // 旧版集成没有视图模型：按相同结构在本地构建，同一份历史只构建一次
+  _localViewModel(history) {
+    if (this._localHistory === history) return this._localModel;
+
+    const years = {};
+    const calendar = {};
+    history.forEach(d => {
+      if (!d.date) return;
+      const year = d.date.slice(0, 4);
+      const month = parseInt(d.date.slice(5, 7), 10) - 1;
+      const isPaid = d.is_paid === true || d.is_paid === 'true';
+      const rollup = years[year] || (years[year] = { volume: 0, amount: 0, months: 0, paid_months: 0, unpaid_months: 0 });
+      rollup.volume += d.volume;
+      rollup.amount += d.amount;
+      rollup.months += 1;
+      rollup[isPaid ? 'paid_months' : 'unpaid_months'] += 1;
+      const grid = calendar[year] || (calendar[year] = { cells: new Array(12).fill(null), latest: -1 });
+      const price = d.volume > 0 ? Math.round(d.amount / d.volume * 100) / 100 : null;
+      grid.cells[month] = [d.volume, d.amount, price, isPaid];
+      grid.latest = Math.max(grid.latest, month);
+    });
+    let previousVolume = null;
+    Object.keys(years).sort().forEach(year => {
+      const rollup = years[year];
+      rollup.volume = Math.round(rollup.volume * 100) / 100;
+      rollup.amount = Math.round(rollup.amount * 100) / 100;
+      rollup.delta_volume = previousVolume === null ? null : Math.round((rollup.volume - previousVolume) * 100) / 100;
+      previousVolume = rollup.volume;
+    });
+
+    const today = new Date();
+    const current = `${today.getFullYear()}-${String(today.getMonth() + 1).padStart(2, '0')}-01`;
+    let end = history.length;
+    while (end > 0 && history[end - 1].date > current) end--;
+    const start = Math.max(0, end - 12);
+    const items = history.slice(start, end);
+    const top = Math.max(...items.map(d => d.volume || 0), 0.1);
+    const chart = {
+      dates: items.map(d => d.date),
+      labels: items.map(d => `${d.date.slice(2, 4)}-${d.date.slice(5, 7)}`),
+      volume: items.map(d => d.volume),
+      amount: items.map(d => d.amount),
+      unit_price: items.map(d => (d.volume > 0 ? Math.round(d.amount / d.volume * 100) / 100 : null)),
+      is_paid: items.map(d => d.is_paid === true || d.is_paid === 'true'),
+      delta: items.map((d, i) => {
+        const previous = i > 0 ? items[i - 1] : history[start - 1];
+        return previous ? Math.round((d.volume - previous.volume) * 100) / 100 : null;
+      }),
+      heights: items.map(d => (d.volume || 0) / top * 100),
+      ticks: [0, Math.round(top / 2), Math.round(top)],
+    };
+
+    this._localHistory = history;
+    this._localModel = { years, calendar, chart };
+    return this._localModel;
+  }
+
+  _getViewModel(historyEntity) {
+    const api = this._getAttribute(historyEntity, 'view_api');
+    if (api) {
+      return this._fetchViewModel(api, this._getAttribute(historyEntity, 'house_id'),
+        this._getAttribute(historyEntity, 'view_version'), this._calendarMonth.getFullYear());
+    }
+    let history = this._getAttribute(historyEntity, 'monthly_history') ||
+      this._decodeHistoryColumns(this._getAttribute(historyEntity, 'monthly_history_columns'));
+    // 向后兼容
+    if (history.length === 0) {
+      history = this._getAttribute(this._config.entity_yearly_volume, 'monthly_history') || EMPTY_HISTORY;
+    }
+    return this._localViewModel(history);
+  }
+
+  // 决定是否需要重新渲染：实体状态对象只在变化时被替换，按引用比较即可
+  _renderKeyFor(historyEntity, model) {
+    const config = this._config;
+    const states = this._hass.states;
+    return [
+      config.entity_current_reading, config.entity_balance, config.entity_yearly_volume,
+      config.entity_yearly_amount, config.entity_monthly_volume, config.entity_monthly_amount,
+      config.entity_unpaid_amount, config.entity_unit_price, historyEntity,
+    ].map(id => id && states[id]).concat([model, config, this._currentView, this._calendarMonth.getFullYear()]);
+  }
+
   _switchView(view) {
     this._currentView = view;
     this._animationPlayed[view] = false;
@@ -54,28 +183,27 @@ class WaterInfoCard extends HTMLElement {
     if (!this._hass || !this._config) return;
 
     const config = this._config;
+    const historyEntity = config.entity_history_data || 'sensor.guotou_water_history_data';
+    const model = this._getViewModel(historyEntity);
+    const renderKey = this._renderKeyFor(historyEntity, model);
+    if (this._renderKey && renderKey.every((value, i) => value === this._renderKey[i])) return;
+    this._renderKey = renderKey;
+
     const theme = config.theme || '';
     const title = config.title || '国投水务';
 
     // 获取数据
     const currentReading = this._getState(config.entity_current_reading) || '--';
     const balance = this._getState(config.entity_balance) || '--';
-    const yearlyVolume = this._getState(config.entity_yearly_volume) || '0';
-    const yearlyAmount = this._getState(config.entity_yearly_amount) || '0';
+    // 本年合计与进度来自视图模型的年度汇总，尚未获取到时使用实体状态
+    const thisYear = model && model.years && model.years[new Date().getFullYear()];
+    const yearlyVolume = thisYear ? thisYear.volume : (this._getState(config.entity_yearly_volume) || '0');
+    const yearlyAmount = thisYear ? thisYear.amount : (this._getState(config.entity_yearly_amount) || '0');
     const monthlyVolume = this._getState(config.entity_monthly_volume) || '0';
     const monthlyAmount = this._getState(config.entity_monthly_amount) || '0';
     const unpaidAmount = this._getState(config.entity_unpaid_amount) || '0';
     const unitPrice = this._getState(config.entity_unit_price) || '--';
 
-    // 获取历史数据
-    const historyEntity = config.entity_history_data || 'sensor.guotou_water_history_data';
-    let monthlyHistory = this._getAttribute(historyEntity, 'monthly_history') || [];
-
-    // 向后兼容
-    if (monthlyHistory.length === 0) {
-      monthlyHistory = this._getAttribute(config.entity_yearly_volume, 'monthly_history') || [];
-    }
-
     // 更新时间
     const querytime = this._getAttribute(config.entity_monthly_volume, 'querytime') ||
       this._getAttribute(config.entity_yearly_volume, 'querytime');
@@ -85,16 +213,6 @@ class WaterInfoCard extends HTMLElement {
       formattedTime = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}-${String(date.getDate()).padStart(2, '0')} ${String(date.getHours()).padStart(2, '0')}:${String(date.getMinutes()).padStart(2, '0')}`;
     }
 
-    // 计算数据哈希
-    const dataHash = JSON.stringify({
-      balance, monthlyAmount, monthlyHistory: monthlyHistory.length,
-      view: this._currentView, calMonth: this._calendarMonth.getTime()
-    });
-
-    const needFullRender = this._lastDataHash !== dataHash;
-    if (!needFullRender) return;
-    this._lastDataHash = dataHash;
-
     const shouldAnimate = !this._animationPlayed[this._currentView];
     if (shouldAnimate) {
       this._animationPlayed[this._currentView] = true;
@@ -117,35 +235,25 @@ class WaterInfoCard extends HTMLElement {
           </div>
           <div class="progress-markers">
             <span>0</span>
-            <span>目标: ${target} m³</span>
+            <span>目标: ${target} m³${thisYear ? ` · 已出账 ${thisYear.months} 个月` : ''}</span>
             <span>${target}</span>
           </div>
         </div>
       `;
     }
 
-    // 生成月度账单日历 HTML
+    // 生成月度账单日历 HTML (单元格来自视图模型)
     const renderCalendar = () => {
       const year = this._calendarMonth.getFullYear();
-
-      const usageMap = {};
-      monthlyHistory.forEach(d => {
-        if (d.date) {
-          const parts = d.date.split('-');
-          const dataYear = parseInt(parts[0], 10);
-          const dataMonth = parseInt(parts[1], 10) - 1;
-          if (dataYear === year) {
-            const unitP = d.volume > 0 ? (d.amount / d.volume).toFixed(2) : '--';
-            const isPaidValue = d.is_paid === true || d.is_paid === 'true';
-            usageMap[dataMonth] = { volume: d.volume, amount: d.amount, date: d.date, unitPrice: unitP, isPaid: isPaidValue };
-          }
-        }
-      });
-
-      // 找到最新有数据的月份
-      let latestMonthWithData = -1;
-      for (let m = 11; m >= 0; m--) {
-        if (usageMap[m]) { latestMonthWithData = m; break; }
+      const grid = (model && model.calendar[year]) || { cells: [], latest: -1 };
+      const rollup = model && model.years && model.years[year];
+      const formatDelta = (value) => (value > 0 ? `+${value}` : `${value}`);
+      let yearSummary = '';
+      if (rollup) {
+        yearSummary = `<div class="calendar-summary">共 ${rollup.volume} m³ / ¥${parseFloat(rollup.amount).toFixed(2)}`;
+        if (rollup.delta_volume != null) yearSummary += ` · 较上年 ${formatDelta(rollup.delta_volume)} m³`;
+        if (rollup.unpaid_months > 0) yearSummary += ` · 未缴 ${rollup.unpaid_months} 个月`;
+        yearSummary += '</div>';
       }
 
       const months = ['1月', '2月', '3月', '4月', '5月', '6月', '7月', '8月', '9月', '10月', '11月', '12月'];
@@ -155,28 +263,31 @@ class WaterInfoCard extends HTMLElement {
           <span>${year}年</span>
           <button class="cal-nav" id="cal-next">&gt;</button>
         </div>
+        ${yearSummary}
         <div class="month-grid">
       `;
 
       const today = new Date();
       for (let m = 0; m < 12; m++) {
         const isCurrentMonth = today.getFullYear() === year && today.getMonth() === m;
-        const usage = usageMap[m];
-        const hasData = usage && usage.volume > 0;
-        const isLatestMonth = m === latestMonthWithData;
-        const showUnpaid = isLatestMonth && hasData && !usage.isPaid;
+        const cell = grid.cells[m];
+        const hasData = cell && cell[0] > 0;
+        const [volume, amount, price, isPaid] = cell || [];
+        const isLatestMonth = m === grid.latest;
+        const showUnpaid = isLatestMonth && hasData && !isPaid;
+        const date = `${year}-${String(m + 1).padStart(2, '0')}`;
 
         calendarHtml += `
           <div class="month-cell ${isCurrentMonth ? 'current' : ''} ${hasData ? 'has-data' : ''} ${showUnpaid ? 'unpaid' : ''}" 
-               data-volume="${hasData ? usage.volume : ''}" 
-               data-amount="${hasData ? usage.amount : ''}"
-               data-date="${hasData ? usage.date : ''}"
-               data-price="${hasData ? usage.unitPrice : ''}"
-               data-paid="${hasData ? usage.isPaid : ''}"
+               data-volume="${hasData ? volume : ''}" 
+               data-amount="${hasData ? amount : ''}"
+               data-date="${hasData ? date : ''}"
+               data-price="${hasData && price != null ? price.toFixed(2) : '--'}"
+               data-paid="${hasData ? isPaid : ''}"
                data-latest="${isLatestMonth}">
             <span class="month-name">${months[m]}</span>
-            ${hasData ? `<span class="month-usage">${usage.volume}m³</span>` : ''}
-            ${hasData ? `<span class="month-cost">¥${parseFloat(usage.amount).toFixed(0)}</span>` : ''}
+            ${hasData ? `<span class="month-usage">${volume}m³</span>` : ''}
+            ${hasData ? `<span class="month-cost">¥${parseFloat(amount).toFixed(0)}</span>` : ''}
             ${showUnpaid ? '<span class="unpaid-tag">未缴</span>' : ''}
           </div>
         `;
@@ -186,22 +297,14 @@ class WaterInfoCard extends HTMLElement {
       return calendarHtml;
     };
 
-    // 生成月用水图表 (近12个月)
+    // 生成月用水图表 (近12个月，序列与柱高来自视图模型)
     const renderMonthlyChart = () => {
-      const today = new Date();
-      const currentMonthStr = `${today.getFullYear()}-${String(today.getMonth() + 1).padStart(2, '0')}`;
-
-      let endIndex = monthlyHistory.findIndex(d => d.date === currentMonthStr);
-      if (endIndex === -1) endIndex = monthlyHistory.length - 1;
-      const startIndex = Math.max(0, endIndex - 11);
-      const last12Months = monthlyHistory.slice(startIndex, endIndex + 1);
-
-      if (last12Months.length === 0) {
+      const chart = model && model.chart;
+      if (!chart || chart.dates.length === 0) {
         return '<div class="no-data">暂无数据</div>';
       }
-      const maxVolume = Math.max(...last12Months.map(d => d.volume || 0), 0.1);
-      const yTicks = [0, Math.round(maxVolume / 2), Math.round(maxVolume)];
-      const latestIndex = last12Months.length - 1;
+      const yTicks = chart.ticks;
+      const latestIndex = chart.dates.length - 1;
 
       let html = `
         <div class="chart-container">
@@ -214,17 +317,12 @@ class WaterInfoCard extends HTMLElement {
           <div class="chart-main">
             <div class="chart-bars monthly">
       `;
-      last12Months.forEach((item, index) => {
-        const volumeHeight = (item.volume / maxVolume) * 100;
-        let label = '';
-        if (item.date) {
-          const parts = item.date.split('-');
-          label = parts[0].slice(2) + '-' + parts[1];
-        } else {
-          label = (index + 1) + '月';
-        }
-        const unitP = item.volume > 0 ? (item.amount / item.volume).toFixed(2) : '--';
-        const isPaidValue = item.is_paid === true || item.is_paid === 'true';
+      chart.dates.forEach((date, index) => {
+        const volumeHeight = chart.heights[index];
+        const price = chart.unit_price[index];
+        const unitP = price != null ? price.toFixed(2) : '--';
+        const isPaidValue = chart.is_paid[index];
+        const delta = chart.delta ? chart.delta[index] : null;
         const isLatest = index === latestIndex;
         const showUnpaid = isLatest && !isPaidValue;
 
@@ -233,10 +331,10 @@ class WaterInfoCard extends HTMLElement {
         const heightStyle = shouldAnimate ? `--target-height: ${volumeHeight}%; animation-delay: ${delay}ms;` : `height: ${volumeHeight}%;`;
         html += `
           <div class="chart-bar-wrapper">
-            <div class="chart-bar" data-volume="${item.volume}" data-amount="${item.amount}" data-date="${item.date || ''}" data-price="${unitP}" data-paid="${isPaidValue}" data-latest="${isLatest}">
+            <div class="chart-bar" data-volume="${chart.volume[index]}" data-amount="${chart.amount[index]}" data-date="${date}" data-price="${unitP}" data-delta="${delta != null ? delta : ''}" data-paid="${isPaidValue}" data-latest="${isLatest}">
               <div class="bar-fill monthly ${animClass} ${showUnpaid ? 'unpaid' : ''}" style="${heightStyle}"></div>
             </div>
-            <div class="bar-label">${label}</div>
+            <div class="bar-label">${chart.labels[index]}</div>
           </div>
         `;
       });
@@ -387,6 +485,7 @@ class WaterInfoCard extends HTMLElement {
           background: none; border: none; font-size: 14px; cursor: pointer;
           color: #1976d2; padding: 4px 8px;
         }
+        .calendar-summary { font-size: 11px; color: #666; text-align: center; margin-bottom: 6px; }
         .month-grid {
           display: grid; grid-template-columns: repeat(3, 1fr); gap: 4px;
         }
@@ -557,6 +656,7 @@ class WaterInfoCard extends HTMLElement {
         const amount = bar.dataset.amount;
         const date = bar.dataset.date;
         const price = bar.dataset.price;
+        const delta = bar.dataset.delta;
         const isPaid = bar.dataset.paid === 'true';
         const isLatest = bar.dataset.latest === 'true';
 
@@ -566,6 +666,9 @@ class WaterInfoCard extends HTMLElement {
           <div>💰 费用: ¥${parseFloat(amount).toFixed(2)}</div>
           <div>📊 单价: ${price} 元/m³</div>
         `;
+        if (delta !== '') {
+          tooltipContent += `<div>📈 环比: ${parseFloat(delta) > 0 ? '+' : ''}${delta} m³</div>`;
+        }
         if (isLatest) {
           tooltipContent += `<div>${isPaid ? '✅ 已缴费' : '❌ 未缴费'}</div>`;
         }
@@ -593,20 +696,25 @@ class WaterInfoCard extends HTMLElement {
     return document.createElement('water-info-card-editor');
   }
 
-  static getStubConfig() {
+  static getStubConfig(hass) {
+    // 每户实体为 sensor.guotou_water_<户号>_*，取第一户；旧安装沿用 sensor.guotou_water_*
+    const history = Object.keys((hass && hass.states) || {})
+      .filter((id) => /^sensor\.guotou_water_.*history_data$/.test(id))
+      .sort()[0];
+    const prefix = history ? history.slice(0, -'history_data'.length) : 'sensor.guotou_water_';
     return {
       title: "国投水务",
       theme: "",
       yearly_target: "200",
-      entity_current_reading: "sensor.guotou_water_current_reading",
-      entity_balance: "sensor.guotou_water_balance",
-      entity_yearly_volume: "sensor.guotou_water_yearly_volume",
-      entity_yearly_amount: "sensor.guotou_water_yearly_amount",
-      entity_monthly_volume: "sensor.guotou_water_monthly_volume",
-      entity_monthly_amount: "sensor.guotou_water_monthly_amount",
-      entity_unpaid_amount: "sensor.guotou_water_unpaid_amount",
-      entity_unit_price: "sensor.guotou_water_unit_price",
-      entity_history_data: "sensor.guotou_water_history_data"
+      entity_current_reading: `${prefix}current_reading`,
+      entity_balance: `${prefix}balance`,
+      entity_yearly_volume: `${prefix}yearly_volume`,
+      entity_yearly_amount: `${prefix}yearly_amount`,
+      entity_monthly_volume: `${prefix}monthly_volume`,
+      entity_monthly_amount: `${prefix}monthly_amount`,
+      entity_unpaid_amount: `${prefix}unpaid_amount`,
+      entity_unit_price: `${prefix}unit_price`,
+      entity_history_data: `${prefix}history_data`
     };
   }
 }